@@ -0,0 +1,116 @@
+"""
+Benchmarks for the tracker pipeline on synthetic accounts, no Instagram login needed.
+
+python benchmarks/bench_pipeline.py                       - 10k, 100k, 1M and 5M users
+python benchmarks/bench_pipeline.py --sizes 10000 100000  - selected sizes only
+python benchmarks/bench_pipeline.py --no-memory           - skip the tracemalloc pass
+python benchmarks/bench_pipeline.py --concurrency         - sequential vs concurrent fetch of both lists
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from instagram_tracker.data_manager import InstagramDataManager
+from instagram_tracker.interfaces import fetch_relationship_ids
+from instagram_tracker.rate_limiter import AdaptiveRateLimiter
+from instagram_tracker.replay import SyntheticStrategy
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 5_000_000]
+DEFAULT_LATENCIES = [0.0, 0.025, 0.05, 0.1]
+
+def measure(func, track_memory: bool):
+    """Runs func and returns (result, seconds, peak bytes or None)"""
+    if track_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    peak = None
+    if track_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+def run_stages(size: int, data_dir: str, args, track_memory: bool):
+    """Runs every stage once and yields (stage, users processed, seconds, peak bytes)"""
+    strategy = SyntheticStrategy(size, churn=args.churn, page_size=args.page_size, seed=size)
+    data_manager = InstagramDataManager(data_dir)
+
+    (followers, following), elapsed, peak = measure(lambda: strategy.get_relationship_ids("bench"), track_memory)
+    users = len(followers) + len(following)
+    yield "fetch processing", users, elapsed, peak
+
+    path, elapsed, peak = measure(lambda: data_manager.save_data("bench", followers, following), track_memory)
+    yield "save_data", users, elapsed, peak
+
+    old_data, elapsed, peak = measure(lambda: data_manager.load_data(path), track_memory)
+    yield "load_data", users, elapsed, peak
+
+    strategy.advance()
+    new_followers, new_following = strategy.get_relationship_ids("bench")
+    _, elapsed, peak = measure(lambda: data_manager.compare_data(old_data, new_followers, new_following),
+                               track_memory)
+    yield "compare_data", users, elapsed, peak
+
+    _, elapsed, peak = measure(lambda: (new_following - new_followers).usernames(), track_memory)
+    yield "non-followers", len(new_followers) + len(new_following), elapsed, peak
+
+def run_concurrency(args):
+    """Times fetching both lists one after the other and at the same time through a clone,
+    with the same rate limiter delay and different page latencies"""
+    size = args.sizes[0]
+    print(f"{'latency':>8} {'delay':>7} {'pages':>6} {'sequential':>11} {'concurrent':>11}")
+    for latency in args.latencies:
+        timings = []
+        for fetch in (lambda strategy: (strategy.get_follower_ids("bench"), strategy.get_following_ids("bench")),
+                      lambda strategy: fetch_relationship_ids(strategy, "bench")):
+            strategy = SyntheticStrategy(size, page_size=args.page_size, page_latency=latency,
+                                         rate_limiter=AdaptiveRateLimiter(delay=args.delay, burst=1), seed=size)
+            _, elapsed, _ = measure(lambda: fetch(strategy), track_memory=False)
+            timings.append(elapsed)
+        pages = -(-size // args.page_size) + -(-size // 2 // args.page_size)
+        print(f"{latency:8.3f} {args.delay:7.3f} {pages:>6} {timings[0]:11.3f} {timings[1]:11.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк обработки подписчиков на синтетических данных')
+    parser.add_argument('--sizes', nargs='+', type=int, help='Число подписчиков')
+    parser.add_argument('--churn', type=float, default=0.01, help='Доля изменившихся подписок между снимками')
+    parser.add_argument('--page-size', type=int, help='Пользователей на страницу')
+    parser.add_argument('--no-memory', action='store_true', help='Не измерять пиковую память')
+    parser.add_argument('--concurrency', action='store_true',
+                        help='Сравнить загрузку списков по очереди и одновременно')
+    parser.add_argument('--delay', type=float, default=0.05, help='Задержка ограничителя для --concurrency, с')
+    parser.add_argument('--latencies', nargs='+', type=float, default=DEFAULT_LATENCIES,
+                        help='Задержки ответа страницы для --concurrency, с')
+    args = parser.parse_args()
+
+    if args.concurrency:
+        # Few small pages, so that pacing and latency dominate the run, not processing
+        args.sizes = args.sizes or [2000]
+        args.page_size = args.page_size or 100
+        run_concurrency(args)
+        return
+    args.sizes = args.sizes or DEFAULT_SIZES
+    args.page_size = args.page_size or 1000
+
+    print(f"{'size':>10} {'stage':<18} {'seconds':>9} {'users/s':>12} {'peak MB':>9}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as data_dir:
+            timings = list(run_stages(size, data_dir, args, track_memory=False))
+        peaks = {}
+        if not args.no_memory:
+            with tempfile.TemporaryDirectory() as data_dir:
+                peaks = {stage: peak for stage, _, _, peak in run_stages(size, data_dir, args, track_memory=True)}
+
+        for stage, users, elapsed, _ in timings:
+            throughput = users / elapsed if elapsed > 0 else float("inf")
+            peak = f"{peaks[stage] / 2 ** 20:9.1f}" if stage in peaks else f"{'-':>9}"
+            print(f"{size:>10} {stage:<18} {elapsed:9.3f} {throughput:12,.0f} {peak}")
+
+if __name__ == "__main__":
+    main()
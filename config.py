@@ -1,12 +1,65 @@
 import os
-from dotenv import load_dotenv
 
-load_dotenv()
-
-INSTAGRAM_USERNAME = os.getenv('INSTAGRAM_USERNAME')
-INSTAGRAM_PASSWORD = os.getenv('INSTAGRAM_PASSWORD')
+def load_env():
+    """Loads credentials from .env; only modes that log in need python-dotenv"""
+    from dotenv import load_dotenv
+    load_dotenv()
 
 # Instagram scraping settings
 DELAY_BETWEEN_REQUESTS = 5  # seconds
 MAX_RETRIES = 5  # increased from 3 to 5
-RETRY_DELAY = 10  # seconds to wait between retries 
\ No newline at end of file
+RETRY_DELAY = 10  # seconds to wait between retries 
+
+# Rate limiter settings
+RATE_LIMIT_BURST = 3  # requests that may be sent back to back
+MAX_BACKOFF = 600  # longest pause after repeated throttling, seconds
+MIN_RATE_FACTOR = 0.1  # slowest pace as a fraction of the configured one
+RATE_RECOVERY_STEP = 0.05  # pace regained per successful request, same units
+
+# Streaming fetch settings
+PAGE_SIZE = 200  # users requested per page
+CHECKPOINT_DIR = os.path.join("data", ".checkpoints")  # saved pagination cursors
+CHECKPOINT_MAX_AGE = 12 * 60 * 60  # seconds after which a saved cursor is discarded and the fetch starts over
+
+# Saved login sessions
+SESSION_DIR = os.path.join("data", ".sessions")
+
+# SQLite snapshot storage
+SNAPSHOT_DB = os.path.join("data", "snapshots.sqlite3")
+KEYFRAME_INTERVAL = 24  # every N-th snapshot is stored in full, the rest as changes
+
+# Progress reporting
+PROGRESS_EVERY = 1000  # users processed between progress updates
+
+
+# Daemon mode
+DAEMON_INTERVAL = 6 * 60 * 60  # default seconds between polls of one account
+DAEMON_JITTER = 0.1  # polls drift randomly by up to this fraction of the interval
+DAEMON_STATUS_FILE = os.path.join("data", "daemon_status.json")  # queue state and last runs
+RELOGIN_AFTER_FAILURES = 3  # failed polls in a row before logging in again
+
+# Quick delta fetch
+QUICK_KNOWN_RUN = 100  # already known users in a row after which a quick fetch stops paging
+FULL_RECONCILE_INTERVAL = 24 * 60 * 60  # seconds between full fetches when --quick is used
+
+# Profile enrichment
+ENRICH_WORKERS = 4  # profiles looked up in parallel, each worker with its own client behind one rate limiter
+ENRICH_LAST_POST = True  # one extra request per profile to find the date of the last post
+PROFILE_CACHE_DB = os.path.join("data", "profiles.sqlite3")
+PROFILE_TTL = 7 * 24 * 60 * 60  # seconds a cached profile stays fresh
+PROFILE_CACHE_SIZE = 50000  # least recently used profiles beyond this are evicted
+
+# Username -> pk resolution
+USER_ID_DB = os.path.join("data", "user_ids.sqlite3")
+USER_ID_TTL = 30 * 24 * 60 * 60  # pks never change, only a username may pass to another account
+USER_ID_VERIFY_AFTER = 7 * 24 * 60 * 60  # seconds after which a cached pk is checked against its username again
+
+# Progress output and metrics
+PROGRESS_RATE = 4  # console progress updates per second at most
+METRICS_FLUSH_INTERVAL = 10  # seconds between rewrites of the metrics file
+
+# Streaming snapshot files (--format ndjson)
+SNAPSHOT_RUN_SIZE = 200000  # users sorted in memory before a run is spilled to a temporary file
+
+# Cross-account overlap (--overlap)
+OVERLAP_LIST_LIMIT = 20  # usernames printed per list, the rest is only counted
@@ -1,5 +1,10 @@
-from typing import Set
-from .interfaces import InstagramDataStrategy, ProgressObserver
+import queue
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional, Set
+from .interfaces import InstagramDataStrategy, ProgressObserver, fetch_relationships
+from .user_ids import as_usernames
+from .profile_cache import ProfileCache
+from config import ENRICH_WORKERS
 
 class InstagramAnalyzer:
     """Main class for analyzing Instagram relationships"""
@@ -22,14 +27,64 @@ class InstagramAnalyzer:
     
     def find_non_followers(self, username: str) -> Set[str]:
         """Find users who don't follow back"""
-        followers = self.strategy.get_followers(username)
-        following = self.strategy.get_following(username)
-        
-        non_followers = following - followers
+        followers, following = fetch_relationships(self.strategy, username)
+        non_followers = as_usernames(following - followers)
         
         if self.progress_subject:
             self.progress_subject.notify(
                 f"Анализ завершен, найдено {len(non_followers)} пользователей, которые не подписаны в ответ."
             )
         
-        return non_followers 
\ No newline at end of file
+        return non_followers
+    
+    def _worker_strategies(self, workers: int) -> List[InstagramDataStrategy]:
+        """The strategy plus up to workers - 1 clones; a strategy that cannot be cloned works alone"""
+        if not hasattr(self.strategy, "clone"):
+            return [self.strategy]
+        return [self.strategy] + [self.strategy.clone() for _ in range(workers - 1)]
+    
+    def enrich(self, usernames: Iterable[str], cache: Optional[ProfileCache] = None,
+               workers: int = ENRICH_WORKERS) -> List[Dict]:
+        """Look up profiles of the given users, cached ones first, the rest through a bounded worker pool;
+        a failed lookup yields a profile with only username and error. The strategy must provide get_profile"""
+        usernames = sorted(set(usernames))
+        if cache:
+            # Stale profiles of users no longer asked for would otherwise stay until evicted
+            cache.purge_expired()
+        profiles = cache.get_many(usernames) if cache else {}
+        missing = [username for username in usernames if username not in profiles]
+        if self.progress_subject:
+            self.progress_subject.notify(
+                f"Профили: {len(profiles)} из кэша, загружаем {len(missing)}..."
+            )
+        if not missing:
+            return [profiles[username] for username in usernames]
+        
+        # Every worker takes a strategy of its own from the pool for one lookup
+        idle = queue.Queue()
+        for strategy in self._worker_strategies(max(1, min(workers, len(missing)))):
+            idle.put(strategy)
+        
+        def get_profile(username: str) -> Dict:
+            strategy = idle.get()
+            try:
+                return strategy.get_profile(username)
+            finally:
+                idle.put(strategy)
+        
+        step = max(1, len(missing) // 20)
+        with ThreadPoolExecutor(max_workers=idle.qsize()) as executor:
+            futures = {executor.submit(get_profile, username): username for username in missing}
+            for done, future in enumerate(as_completed(futures), 1):
+                username = futures[future]
+                try:
+                    profiles[username] = future.result()
+                    if cache:
+                        cache.put(username, profiles[username])
+                except Exception as e:
+                    profiles[username] = {"username": username, "error": str(e)}
+                if self.progress_subject and (done % step == 0 or done == len(missing)):
+                    self.progress_subject.progress(f"Загружено профилей: {done} из {len(missing)}.",
+                                                 done / len(missing) * 100)
+        
+        return [profiles[username] for username in usernames]
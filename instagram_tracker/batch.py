@@ -0,0 +1,104 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Mapping, Tuple
+from .interfaces import InstagramDataStrategy, ProgressSubject, fetch_relationships, timed
+from .data_manager import InstagramDataManager
+from .quick_delta import QuickDeltaFetcher
+
+def parse_credentials(environ: Mapping[str, str]) -> List[Tuple[str, str]]:
+    """Read (login, password) pairs from INSTAGRAM_USERNAME/INSTAGRAM_PASSWORD and the numbered
+    INSTAGRAM_USERNAME_2/INSTAGRAM_PASSWORD_2, _3, ... up to the first missing pair. Every password
+    is a variable of its own, so it may contain any character"""
+    credentials = []
+    index = 1
+    while True:
+        suffix = "" if index == 1 else f"_{index}"
+        login = environ.get(f"INSTAGRAM_USERNAME{suffix}")
+        password = environ.get(f"INSTAGRAM_PASSWORD{suffix}")
+        if not login or not password:
+            return credentials
+        if (login, password) not in credentials:
+            credentials.append((login, password))
+        index += 1
+
+def read_targets(path: str) -> List[str]:
+    """Read target usernames, one per line; blank lines and # comments are skipped"""
+    targets = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            username = line.split("#", 1)[0].strip().lstrip("@")
+            if username and username not in targets:
+                targets.append(username)
+    return targets
+
+class BatchRunner(ProgressSubject):
+    """Tracks many accounts with one worker per logged-in strategy; the rate limiter of a login
+    paces all of its requests, so more workers on the same login would not finish sooner"""
+
+    def __init__(self, strategies: List[InstagramDataStrategy], data_manager: InstagramDataManager,
+                 quick: bool = False):
+        super().__init__()
+        self.strategies = strategies
+        self.data_manager = data_manager
+        self.quick = quick
+        self._results_lock = threading.Lock()
+
+    def run(self, targets: List[str]) -> List[Dict]:
+        """Fetch, save and compare every target; returns one result per target in input order"""
+        pending = queue.Queue()
+        for target in targets:
+            pending.put(target)
+
+        results = {}
+        # Logins work in parallel, each with its own rate budget
+        with ThreadPoolExecutor(max_workers=len(self.strategies)) as executor:
+            for strategy in self.strategies:
+                executor.submit(self._worker, strategy, pending, results, len(targets))
+        return [results[target] for target in targets]
+
+    def _worker(self, strategy: InstagramDataStrategy, pending: queue.Queue, results: Dict, total: int):
+        while True:
+            try:
+                target = pending.get_nowait()
+            except queue.Empty:
+                return
+            result = self.track(strategy, target)
+            with self._results_lock:
+                results[target] = result
+                done = len(results)
+            status = "ошибка: " + result["error"] if result["error"] else "готово"
+            self.notify(f"[{done}/{total}] {target}: {status}", done / total * 100)
+
+    @timed("track")
+    def track(self, strategy: InstagramDataStrategy, target: str) -> Dict:
+        """Fetch one target, save its snapshot and the comparison with the previous one"""
+        started = time.monotonic()
+        result = {"username": target, "error": None, "file": None, "comparison_file": None}
+        try:
+            previous = self.data_manager.get_latest_snapshot(target)
+            reconciled_at = None
+            if self.quick:
+                followers, following, reconciled_at = QuickDeltaFetcher(strategy).fetch(target, previous)
+            else:
+                followers, following = fetch_relationships(strategy, target)
+            non_followers = len(following - followers)
+
+            # Fetch errors raise IncompleteFetchError before this point; an account that returned
+            # nothing at all is still not worth a snapshot
+            if not followers and not following:
+                raise ValueError("не удалось получить подписчиков и подписки")
+
+            result["file"] = self.data_manager.save_data(target, followers, following, reconciled_at)
+            result.update(followers_count=len(followers), following_count=len(following),
+                          non_followers_count=non_followers, quick=reconciled_at is not None)
+            if previous:
+                comparison = self.data_manager.compare_data(previous, followers, following)
+                result["comparison_file"] = self.data_manager.save_comparison(target, comparison)
+                result["changes"] = {key: len(comparison[key]) for key in
+                                     ("new_followers", "unfollowers", "new_following", "unfollowed", "renamed")}
+        except Exception as e:
+            result["error"] = str(e)
+        result["seconds"] = round(time.monotonic() - started, 1)
+        return result
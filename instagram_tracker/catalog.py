@@ -0,0 +1,199 @@
+import bisect
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DATA = "data"
+COMPARISON = "comparison"
+
+# Имена файлов, которые создает InstagramDataManager
+DATA_FILE_RE = re.compile(r"^(?P<username>.+)_(?P<timestamp>\d{2}_\d{2}_\d{4}_\d{2}_\d{2})(?:_(?P<suffix>\d+))?\.(?:json|ndjson\.gz)$")
+COMPARISON_FILE_RE = re.compile(r"^(?P<username>.+)_comparison_(?P<timestamp>\d{4}-\d{2}-\d{2}_\d{2}-\d{2})(?:_(?P<suffix>\d+))?\.json$")
+
+def parse_data_filename(filename: str) -> Optional[Tuple[str, datetime, int]]:
+    """Имя пользователя, время снимка и номер суффикса (_2, _3...) из имени файла данных, или None"""
+    match = DATA_FILE_RE.match(filename)
+    if not match:
+        return None
+    timestamp = datetime.strptime(match.group("timestamp"), "%d_%m_%Y_%H_%M")
+    return match.group("username"), timestamp, int(match.group("suffix") or 1)
+
+# Запись индекса: (время снимка ISO с точностью до минуты, номер суффикса, имя файла).
+# Файлы одной минуты упорядочиваются по номеру суффикса, а не по имени (_10 после _9)
+Entry = Tuple[str, int, str]
+INDEX_VERSION = 2
+
+def _parse_filename(filename: str) -> Optional[Tuple[str, str, Entry]]:
+    """Вид файла (DATA или COMPARISON), имя пользователя и запись индекса, или None"""
+    parsed = parse_data_filename(filename)
+    if parsed:
+        username, timestamp, suffix = parsed
+        return DATA, username, (timestamp.isoformat(timespec="seconds"), suffix, filename)
+    match = COMPARISON_FILE_RE.match(filename)
+    if not match:
+        return None
+    timestamp = datetime.strptime(match.group("timestamp"), "%Y-%m-%d_%H-%M")
+    return COMPARISON, match.group("username"), (timestamp.isoformat(timespec="seconds"),
+                                                 int(match.group("suffix") or 1), filename)
+
+@contextmanager
+def _file_lock(path: str) -> Iterator[None]:
+    """Межпроцессная блокировка на время чтения-изменения-записи индекса (например, cron и демон)"""
+    with open(path, 'a+') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK сдается после 10 секунд ожидания
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+class SnapshotCatalog:
+    """Индекс файлов данных по пользователю и времени снимка, хранится в index.json.
+    Индекс записывается при добавлении файла и при перестроении после ручного удаления файлов;
+    чтение в остальных случаях его не создает и не меняет"""
+
+    def __init__(self, data_dir: str, index_name: str = "index.json"):
+        self.data_dir = data_dir
+        self.path = os.path.join(data_dir, index_name)
+        self._lock = threading.Lock()
+        # username -> kind -> отсортированный список записей
+        self._entries: Dict[str, Dict[str, List[Entry]]] = {}
+        if not os.path.exists(self.path):
+            self.rebuild(write=False)
+        elif not self._load():
+            self.rebuild()
+
+    def _load(self) -> bool:
+        """Читает индекс; False, если он записан в старом формате и его нужно построить заново"""
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("version") != INDEX_VERSION:
+            return False
+        self._entries = {
+            username: {kind: [tuple(entry) for entry in entries] for kind, entries in kinds.items()}
+            for username, kinds in data["users"].items()
+        }
+        return True
+
+    def _write(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": INDEX_VERSION, "users": self._entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def _scan(self):
+        self._entries = {}
+        if not os.path.isdir(self.data_dir):
+            return
+        for filename in os.listdir(self.data_dir):
+            parsed = _parse_filename(filename)
+            if parsed:
+                kind, username, entry = parsed
+                self._entries.setdefault(username, {}).setdefault(kind, []).append(entry)
+        for kinds in self._entries.values():
+            for entries in kinds.values():
+                entries.sort()
+
+    def rebuild(self, write: bool = True):
+        """Строит индекс заново одним проходом по каталогу данных; write=False - только в памяти"""
+        with self._lock:
+            if not write or not os.path.isdir(self.data_dir):
+                self._scan()
+                return
+            with _file_lock(self.path + ".lock"):
+                self._scan()
+                self._write()
+
+    def _insert(self, username: str, kind: str, timestamp: datetime, filename: str):
+        entries = self._entries.setdefault(username, {}).setdefault(kind, [])
+        # Файл уже может быть в индексе: _scan только что нашел его на диске
+        if any(entry[2] == filename for entry in entries):
+            return
+        parsed = _parse_filename(filename)
+        if parsed:
+            entry = parsed[2]
+        else:
+            entry = (timestamp.replace(second=0, microsecond=0).isoformat(timespec="seconds"), 1, filename)
+        bisect.insort(entries, entry)
+
+    def add(self, username: str, kind: str, timestamp: datetime, filename: str):
+        """Добавляет файл в индекс и атомарно сохраняет индекс"""
+        with self._lock, _file_lock(self.path + ".lock"):
+            # Под блокировкой индекс перечитывается: его мог обновить другой процесс
+            if not os.path.exists(self.path) or not self._load():
+                self._scan()
+            self._insert(username, kind, timestamp, os.path.basename(filename))
+            self._write()
+
+    def _get_entries(self, username: str, kind: str,
+                     pick: Callable[[List[Entry]], List[Entry]]) -> List[Entry]:
+        """Записи пользователя. На диске проверяются только записи, которые вернет pick;
+        если какой-то из них нет, индекс строится заново и сохраняется"""
+        entries = self._entries.get(username, {}).get(kind, [])
+        if any(not os.path.exists(os.path.join(self.data_dir, entry[2])) for entry in pick(entries)):
+            self.rebuild()
+            entries = self._entries.get(username, {}).get(kind, [])
+        return pick(entries)
+
+    def _to_dict(self, entry: Entry) -> Dict:
+        timestamp = datetime.fromisoformat(entry[0])
+        return {
+            "filename": entry[2],
+            "path": os.path.join(self.data_dir, entry[2]),
+            "timestamp": timestamp,
+            "display_name": timestamp.strftime("%Y-%m-%d %H:%M")
+        }
+
+    def files(self, username: str, kind: str = DATA, limit: Optional[int] = None) -> List[Dict]:
+        """Файлы пользователя от новых к старым; limit - только первые limit файлов"""
+        def pick(entries):
+            return entries[::-1][:limit]
+        return [self._to_dict(entry) for entry in self._get_entries(username, kind, pick)]
+
+    def nth(self, username: str, index: int, kind: str = DATA) -> Optional[Dict]:
+        """Файл пользователя по номеру от нового к старому: 0 - последний, 1 - предыдущий"""
+        def pick(entries):
+            position = len(entries) - 1 - index
+            return entries[position:position + 1] if 0 <= position < len(entries) else []
+        entries = self._get_entries(username, kind, pick)
+        return self._to_dict(entries[0]) if entries else None
+
+    def latest(self, username: str, kind: str = DATA) -> Optional[Dict]:
+        """Самый новый файл пользователя"""
+        return self.nth(username, 0, kind)
+
+    def closest(self, username: str, when: datetime, kind: str = DATA) -> Optional[Dict]:
+        """Файл, снятый ближе всего к указанному времени"""
+        key = when.isoformat(timespec="seconds")
+        def pick(entries):
+            index = bisect.bisect_left(entries, (key,))
+            return entries[max(0, index - 1):index + 1]
+        candidates = self._get_entries(username, kind, pick)
+        if not candidates:
+            return None
+        return self._to_dict(min(
+            candidates,
+            key=lambda entry: abs((datetime.fromisoformat(entry[0]) - when).total_seconds())
+        ))
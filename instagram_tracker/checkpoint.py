@@ -0,0 +1,72 @@
+import json
+import os
+from datetime import datetime
+from typing import List, Optional, Tuple
+from .pipeline import UserRecord
+from config import CHECKPOINT_MAX_AGE
+
+class FetchCheckpoint:
+    """Persists the pagination cursor of a streaming fetch so it can be resumed"""
+
+    def __init__(self, directory: str, username: str, relation: str, max_age: float = CHECKPOINT_MAX_AGE):
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"{username}_{relation}")
+        self.state_path = base + ".json"
+        self.users_path = base + ".txt"
+        self.max_age = max_age
+
+    def load(self) -> Tuple[Optional[str], List[UserRecord]]:
+        """Return the saved cursor and the user records fetched before it; a checkpoint older than
+        max_age is discarded, since users who followed since then would be missed"""
+        if not os.path.exists(self.state_path):
+            return None, []
+
+        with open(self.state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+
+        updated = state.get("updated")
+        if updated is None or (datetime.now() - datetime.fromisoformat(updated)).total_seconds() > self.max_age:
+            self.clear()
+            return None, []
+
+        users = []
+        if os.path.exists(self.users_path):
+            with open(self.users_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    users.append(UserRecord(*json.loads(line)))
+
+        # Lines written after the last saved cursor belong to an unfinished page
+        count = state["count"]
+        if len(users) != count:
+            users = users[:count]
+            self._rewrite_users(users)
+        return state["cursor"], users
+
+    def save_page(self, users: List[UserRecord], cursor: Optional[str], count: int):
+        """Append one page of user records and move the cursor past it"""
+        with open(self.users_path, 'a', encoding='utf-8') as f:
+            for user in users:
+                f.write(json.dumps(user, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        state = {
+            "cursor": cursor,
+            "count": count,
+            "updated": datetime.now().isoformat(timespec="seconds")
+        }
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def clear(self):
+        """Remove the checkpoint once the fetch has completed"""
+        for path in (self.state_path, self.users_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _rewrite_users(self, users: List[UserRecord]):
+        with open(self.users_path, 'w', encoding='utf-8') as f:
+            for user in users:
+                f.write(json.dumps(user, ensure_ascii=False) + "\n")
@@ -0,0 +1,148 @@
+import heapq
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from .interfaces import InstagramDataStrategy, ProgressSubject
+from .batch import BatchRunner
+from config import DAEMON_INTERVAL, DAEMON_JITTER, DAEMON_STATUS_FILE, RETRY_DELAY, RELOGIN_AFTER_FAILURES
+
+def load_daemon_config(path: str) -> Dict:
+    """Read the daemon config: {"accounts": [{"username": ..., "interval": seconds}], "jitter": 0.1}"""
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    default_interval = config.get("interval", DAEMON_INTERVAL)
+    accounts = []
+    for account in config["accounts"]:
+        if isinstance(account, str):
+            account = {"username": account}
+        accounts.append({"username": account["username"],
+                         "interval": float(account.get("interval", default_interval))})
+    return {"accounts": accounts, "jitter": float(config.get("jitter", DAEMON_JITTER))}
+
+class TrackerDaemon(ProgressSubject):
+    """Polls accounts on their own intervals through one long-lived, logged-in strategy"""
+
+    def __init__(self, strategy: InstagramDataStrategy, runner: BatchRunner, accounts: List[Dict],
+                 jitter: float = DAEMON_JITTER, status_path: Optional[str] = DAEMON_STATUS_FILE,
+                 relogin: Optional[Callable[[], bool]] = None):
+        super().__init__()
+        self.strategy = strategy
+        self.runner = runner
+        self.jitter = jitter
+        self.status_path = status_path
+        self.relogin = relogin
+        self.started = datetime.now()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._failures_in_row = 0
+        self._accounts = {account["username"]: {
+            "username": account["username"],
+            "interval": account["interval"],
+            "next_run": None,
+            "last_run": None,
+            "last_duration": None,
+            "last_error": None,
+            "lag": None,
+            "runs": 0,
+            "failures": 0
+        } for account in accounts}
+        self._queue = []
+        now = time.time()
+        for index, state in enumerate(self._accounts.values()):
+            # Spread the first polls so a restart does not fire every account at once
+            self._schedule(state, now + random.uniform(0, state["interval"] * self.jitter), index)
+
+    def _schedule(self, state: Dict, when: float, order: int = 0):
+        state["next_run"] = when
+        heapq.heappush(self._queue, (when, order, state["username"]))
+
+    def _next_delay(self, state: Dict) -> float:
+        if state["failures"]:
+            # Retry failed accounts sooner, backing off, but never later than the normal interval
+            return min(state["interval"], RETRY_DELAY * 2 ** (state["failures"] - 1))
+        return state["interval"] * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def stop(self):
+        """Ask the loop to finish after the current poll"""
+        self._stop.set()
+
+    def run(self):
+        """Run until stop() is called"""
+        self.notify(f"Демон запущен, аккаунтов: {len(self._accounts)}")
+        while not self._stop.is_set():
+            with self._lock:
+                when, order, username = self._queue[0]
+            wait = when - time.time()
+            if wait > 0:
+                self._write_status()
+                self._stop.wait(wait)
+                continue
+            with self._lock:
+                heapq.heappop(self._queue)
+            self.poll(self._accounts[username], when, order)
+        self._write_status()
+        self.notify("Демон остановлен")
+
+    def poll(self, state: Dict, scheduled: float, order: int = 0):
+        """Fetch one account, record the outcome and reschedule it"""
+        started = time.time()
+        result = self.runner.track(self.strategy, state["username"])
+        with self._lock:
+            state["runs"] += 1
+            state["last_run"] = started
+            state["last_duration"] = round(time.time() - started, 1)
+            state["lag"] = round(started - scheduled, 1)
+            state["last_error"] = result["error"]
+            state["failures"] = state["failures"] + 1 if result["error"] else 0
+            self._failures_in_row = self._failures_in_row + 1 if result["error"] else 0
+            self._schedule(state, time.time() + self._next_delay(state), order)
+
+        if result["error"]:
+            self.notify(f"{state['username']}: ошибка: {result['error']}")
+            # Several failures in a row across accounts usually mean the session has expired
+            if self.relogin and self._failures_in_row >= RELOGIN_AFTER_FAILURES:
+                self.notify("Несколько ошибок подряд, выполняем повторный вход...")
+                self._failures_in_row = 0
+                if not self.relogin():
+                    self.notify("Повторный вход не удался, следующая попытка после новых ошибок")
+        else:
+            self.notify(f"{state['username']}: {result['followers_count']} подписчиков, "
+                        f"{result['following_count']} подписок за {state['last_duration']} с")
+        self._write_status()
+
+    def status(self) -> Dict:
+        """Queue state and last-run times of every account"""
+        now = time.time()
+
+        def to_iso(timestamp):
+            return datetime.fromtimestamp(timestamp).isoformat(timespec="seconds") if timestamp else None
+
+        with self._lock:
+            accounts = sorted(self._accounts.values(), key=lambda state: state["next_run"])
+            return {
+                "started": self.started.isoformat(timespec="seconds"),
+                "updated": to_iso(now),
+                "queue_length": len(self._queue),
+                "overdue": sum(1 for state in accounts if state["next_run"] <= now),
+                "accounts": [dict(state, next_run=to_iso(state["next_run"]), last_run=to_iso(state["last_run"]))
+                             for state in accounts]
+            }
+
+    def _write_status(self):
+        """Write the status file; a write error is reported and never stops the daemon"""
+        if not self.status_path:
+            return
+        tmp_path = self.status_path + ".tmp"
+        try:
+            directory = os.path.dirname(self.status_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.status(), f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.status_path)
+        except OSError as e:
+            self.notify(f"Не удалось записать статус в {self.status_path}: {e}")
@@ -1,71 +1,228 @@
 import json
 import os
 from datetime import datetime
-from typing import Dict, Set, Optional, List
+from typing import Dict, Iterable, Set, Optional, List, Tuple, Union
+from .interfaces import ProgressSubject, timed
+from .sqlite_store import SQLiteSnapshotStore
+from .catalog import SnapshotCatalog, DATA, COMPARISON
+from .user_ids import UserIdSet
+from .stream_snapshot import (EXTENSION as NDJSON_EXTENSION, FOLLOWERS, FOLLOWING, SnapshotReader, SnapshotWriter,
+                              compare_snapshot_files, is_stream_snapshot)
 
-class InstagramDataManager:
+JSON_FORMAT = "json"
+NDJSON_FORMAT = "ndjson"
+
+Users = Union[Set[str], UserIdSet]
+
+def _diff_sorted(old: List[str], new: List[str]) -> Tuple[List[str], List[str]]:
+    """Слиянием двух отсортированных списков находит добавленные и удаленные элементы"""
+    added, removed = [], []
+    i = j = 0
+    while i < len(old) and j < len(new):
+        if old[i] == new[j]:
+            i += 1
+            j += 1
+        elif old[i] < new[j]:
+            removed.append(old[i])
+            i += 1
+        else:
+            added.append(new[j])
+            j += 1
+    removed.extend(old[i:])
+    added.extend(new[j:])
+    return added, removed
+
+def _split_users(users: Users) -> Tuple[List[str], Optional[List[int]]]:
+    """Отсортированные имена и выровненный с ними список pk (None, если pk неизвестны)"""
+    if not isinstance(users, UserIdSet):
+        return sorted(users), None
+    pairs = sorted(users.pairs(), key=lambda pair: pair[1])
+    return [name for _, name in pairs], [pk for pk, _ in pairs]
+
+def _get_ids(data: Dict) -> Optional[Tuple[UserIdSet, UserIdSet]]:
+    """Строит множества по pk из JSON снимка, если в нем сохранены pk"""
+    if "follower_pks" not in data or "following_pks" not in data:
+        return None
+    names = {}
+    return (UserIdSet.from_pairs(zip(data["follower_pks"], data["followers"]), names),
+            UserIdSet.from_pairs(zip(data["following_pks"], data["following"]), names))
+
+def _compare_ids(old: Tuple[UserIdSet, UserIdSet], new: Tuple[UserIdSet, UserIdSet]) -> Dict:
+    """Сравнивает снимки по pk: смена имени - это переименование, а не отписка и новая подписка"""
+    renamed = {}
+    for old_users, new_users in zip(old, new):
+        for pk, old_username, new_username in old_users.renamed(new_users):
+            renamed[pk] = {"pk": pk, "old_username": old_username, "new_username": new_username}
+    return {
+        "new_followers": sorted((new[0] - old[0]).usernames()),
+        "unfollowers": sorted((old[0] - new[0]).usernames()),
+        "new_following": sorted((new[1] - old[1]).usernames()),
+        "unfollowed": sorted((old[1] - new[1]).usernames()),
+        "renamed": sorted(renamed.values(), key=lambda entry: entry["new_username"])
+    }
+
+def _load_history_item(item: Dict) -> Dict:
+    """Дозагружает снимок gzip NDJSON из истории в виде отсортированных списков и множеств по pk"""
+    if "ids" not in item:
+        data = SnapshotReader(item["path"]).to_data()
+        item.update(followers=sorted(data["followers"]), following=sorted(data["following"]),
+                    ids=(data["follower_ids"], data["following_ids"]))
+    return item
+
+class InstagramDataManager(ProgressSubject):
     """Класс для управления данными Instagram"""
     
-    def __init__(self, data_dir: str = "data"):
+    def __init__(self, data_dir: str = "data", store: Optional[SQLiteSnapshotStore] = None,
+                 snapshot_format: str = JSON_FORMAT):
+        super().__init__()
         self.data_dir = data_dir
-        if not os.path.exists(data_dir):
-            os.makedirs(data_dir)
+        self.store = store
+        self.snapshot_format = snapshot_format
+        self.catalog = SnapshotCatalog(data_dir)
     
-    def _get_filename(self, username: str, timestamp: Optional[datetime] = None) -> str:
+    def _get_unique_path(self, name: str, extension: str = ".json") -> str:
+        """Добавляет суффикс _2, _3..., чтобы запуски в одну минуту не перезаписывали друг друга"""
+        # Каталог создается при первой записи, а не при чтении
+        os.makedirs(self.data_dir, exist_ok=True)
+        # Номер суффикса общий для JSON и gzip NDJSON, чтобы снимки одной минуты упорядочивались по нему
+        candidate, suffix = name, 2
+        while any(os.path.exists(os.path.join(self.data_dir, candidate + other))
+                  for other in {extension, ".json", NDJSON_EXTENSION}):
+            candidate = f"{name}_{suffix}"
+            suffix += 1
+        return os.path.join(self.data_dir, candidate + extension)
+    
+    def _get_filename(self, username: str, timestamp: Optional[datetime] = None,
+                      extension: str = ".json") -> str:
         """Генерирует имя файла для пользователя с временной меткой"""
         if timestamp is None:
             timestamp = datetime.now()
-        # Формат: username_DD_MM_YYYY_HH_MM.json
+        # Формат: username_DD_MM_YYYY_HH_MM.json (или .ndjson.gz)
         timestamp_str = timestamp.strftime("%d_%m_%Y_%H_%M")
-        return os.path.join(self.data_dir, f"{username}_{timestamp_str}.json")
+        return self._get_unique_path(f"{username}_{timestamp_str}", extension)
+    
+    def _store_size(self) -> int:
+        """Размер файла базы вместе с журналом WAL, если он есть"""
+        return sum(os.path.getsize(path) for path in (self.store.path, self.store.path + "-wal")
+                   if os.path.exists(path))
     
-    def save_data(self, username: str, followers: Set[str], following: Set[str]) -> str:
-        """Сохраняет данные в JSON файл и возвращает имя файла"""
+    def _get_snapshot_ref(self, snapshot_id: int) -> str:
+        """Ссылка на снимок в базе в виде путь#id"""
+        return f"{self.store.path}#{snapshot_id}"
+    
+    @timed("save")
+    def save_data(self, username: str, followers: Users, following: Users,
+                  reconciled_at: Optional[datetime] = None) -> str:
+        """Сохраняет данные в JSON файл (или в базу, если она подключена) и возвращает имя файла.
+        reconciled_at передается для быстрых снимков: время полной загрузки, на которой они основаны"""
+        if self.store is not None:
+            size = self._store_size()
+            snapshot_id = self.store.save_snapshot(username, followers, following, reconciled_at=reconciled_at)
+            # For the database the growth of its files is counted, not the size of the snapshot
+            self.count("bytes_written", max(0, self._store_size() - size))
+            return self._get_snapshot_ref(snapshot_id)
+        if (self.snapshot_format == NDJSON_FORMAT and isinstance(followers, UserIdSet)
+                and isinstance(following, UserIdSet)):
+            return self.save_stream(username, [followers.pairs()], [following.pairs()], reconciled_at)
+        
+        timestamp = datetime.now()
+        followers_list, follower_pks = _split_users(followers)
+        following_list, following_pks = _split_users(following)
         data = {
             "username": username,
-            "timestamp": datetime.now().strftime("%d_%m_%Y_%H_%M"),
-            "followers": sorted(list(followers)),
-            "following": sorted(list(following)),
+            "timestamp": timestamp.strftime("%d_%m_%Y_%H_%M"),
+            "followers": followers_list,
+            "following": following_list,
             "stats": {
                 "followers_count": len(followers),
                 "following_count": len(following)
             }
         }
+        if reconciled_at is not None:
+            data["quick"] = True
+            data["reconciled_at"] = reconciled_at.strftime("%d_%m_%Y_%H_%M")
+        if follower_pks is not None and following_pks is not None:
+            data["follower_pks"] = follower_pks
+            data["following_pks"] = following_pks
         
-        filename = self._get_filename(username)
+        filename = self._get_filename(username, timestamp)
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
+        self.count("bytes_written", os.path.getsize(filename))
+        self.catalog.add(username, DATA, timestamp, filename)
+        return filename
+    
+    @timed("save")
+    def save_stream(self, username: str, follower_pages: Iterable[Iterable[Tuple]],
+                    following_pages: Iterable[Iterable[Tuple]], reconciled_at: Optional[datetime] = None) -> str:
+        """Сохраняет снимок в gzip NDJSON по мере поступления страниц (пары pk, username или записи)
+        и возвращает имя файла; при ошибке загрузки незаконченный снимок не сохраняется"""
+        timestamp = datetime.now()
+        filename = self._get_filename(username, timestamp, NDJSON_EXTENSION)
+        with SnapshotWriter(filename, username, timestamp, reconciled_at) as writer:
+            for relation, pages in ((FOLLOWERS, follower_pages), (FOLLOWING, following_pages)):
+                for page in pages:
+                    writer.add(relation, page)
+        self.count("bytes_written", os.path.getsize(filename))
+        self.catalog.add(username, DATA, timestamp, filename)
         return filename
     
     def get_available_files(self, username: str) -> List[Dict]:
         """Возвращает список доступных файлов с данными для пользователя"""
-        files = []
-        for filename in os.listdir(self.data_dir):
-            if filename.startswith(f"{username}_") and filename.endswith(".json"):
-                file_path = os.path.join(self.data_dir, filename)
-                timestamp = datetime.fromtimestamp(os.path.getmtime(file_path))
-                files.append({
-                    "filename": filename,
-                    "path": file_path,
-                    "timestamp": timestamp,
-                    "display_name": timestamp.strftime("%Y-%m-%d %H:%M")
-                })
-        return sorted(files, key=lambda x: x["timestamp"], reverse=True)
+        return self.catalog.files(username, DATA)
+    
+    def get_latest_file(self, username: str) -> Optional[Dict]:
+        """Возвращает самый новый файл с данными для пользователя"""
+        return self.catalog.latest(username, DATA)
+    
+    def find_closest_file(self, username: str, when: datetime) -> Optional[Dict]:
+        """Возвращает файл с данными, снятый ближе всего к указанному времени"""
+        return self.catalog.closest(username, when, DATA)
     
+    def exists(self, file_path: str) -> bool:
+        """Проверяет, что файл или снимок в базе существует"""
+        if self.store is not None and file_path.startswith(f"{self.store.path}#"):
+            return self.load_data(file_path) is not None
+        return os.path.exists(file_path)
+    
+    @timed("load")
     def load_data(self, file_path: str) -> Optional[Dict]:
-        """Загружает данные из JSON файла"""
+        """Загружает данные из JSON файла или по ссылке на снимок в базе"""
+        if self.store is not None and file_path.startswith(f"{self.store.path}#"):
+            snapshot_id = file_path.rsplit("#", 1)[1]
+            # Неверная ссылка - такой же ненайденный снимок, как и отсутствующий файл
+            return self.store.load_snapshot(int(snapshot_id)) if snapshot_id.isdigit() else None
+        
         if not os.path.exists(file_path):
             return None
+        if is_stream_snapshot(file_path):
+            return SnapshotReader(file_path).to_data()
         
         with open(file_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
+            ids = _get_ids(data)
+            if ids is not None:
+                data['follower_ids'], data['following_ids'] = ids
             # Конвертируем списки обратно в множества
             data['followers'] = set(data['followers'])
             data['following'] = set(data['following'])
             return data
     
-    def compare_data(self, old_data: Dict, new_followers: Set[str], new_following: Set[str]) -> Dict:
+    @timed("compare")
+    def compare_data(self, old_data: Dict, new_followers: Users, new_following: Users) -> Dict:
         """Сравнивает старые и новые данные"""
+        if (isinstance(new_followers, UserIdSet) and isinstance(new_following, UserIdSet)
+                and 'follower_ids' in old_data and 'following_ids' in old_data):
+            comparison = _compare_ids((old_data['follower_ids'], old_data['following_ids']),
+                                      (new_followers, new_following))
+            comparison["timestamp"] = datetime.now().strftime("%d_%m_%Y_%H_%M")
+            comparison["compared_with"] = old_data['timestamp']
+            return comparison
+        
+        if isinstance(new_followers, UserIdSet):
+            new_followers = new_followers.usernames()
+        if isinstance(new_following, UserIdSet):
+            new_following = new_following.usernames()
         old_followers = set(old_data['followers'])
         old_following = set(old_data['following'])
         
@@ -83,14 +240,104 @@ class InstagramDataManager:
             "unfollowers": sorted(list(new_followers_removed)),
             "new_following": sorted(list(new_following_added)),
             "unfollowed": sorted(list(new_following_removed)),
+            "renamed": [],
             "timestamp": datetime.now().strftime("%d_%m_%Y_%H_%M"),
             "compared_with": old_data['timestamp']
         }
     
+    def get_latest_snapshot(self, username: str) -> Optional[Dict]:
+        """Загружает последний сохраненный снимок пользователя"""
+        if self.store is not None:
+            return self.store.latest_snapshot(username)
+        latest = self.catalog.latest(username, DATA)
+        return self.load_data(latest["path"]) if latest else None
+    
+    def get_snapshot_ref(self, username: str, index: int = 0) -> Optional[str]:
+        """Путь (или ссылка на базу) снимка пользователя по номеру от нового к старому:
+        0 - последний, 1 - предыдущий"""
+        if self.store is not None:
+            snapshots = self.store.list_snapshots(username)
+            return self._get_snapshot_ref(snapshots[index]["snapshot_id"]) if index < len(snapshots) else None
+        file_info = self.catalog.nth(username, index, DATA)
+        return file_info["path"] if file_info else None
+    
+    def get_snapshot(self, username: str, index: int = 0) -> Optional[Dict]:
+        """Загружает снимок пользователя по номеру от нового к старому"""
+        ref = self.get_snapshot_ref(username, index)
+        return self.load_data(ref) if ref else None
+    
+    def compare_snapshots(self, old_data: Dict, new_data: Dict) -> Dict:
+        """Сравнивает два сохраненных снимка"""
+        if 'follower_ids' in new_data and 'following_ids' in new_data:
+            comparison = self.compare_data(old_data, new_data['follower_ids'], new_data['following_ids'])
+        else:
+            comparison = self.compare_data(old_data, set(new_data['followers']), set(new_data['following']))
+        comparison["timestamp"] = new_data['timestamp']
+        return comparison
+    
+    @timed("compare")
+    def compare_files(self, old_ref: str, new_ref: str) -> Dict:
+        """Сравнивает два сохраненных снимка; снимки gzip NDJSON сравниваются потоково"""
+        if is_stream_snapshot(old_ref) and is_stream_snapshot(new_ref):
+            return compare_snapshot_files(old_ref, new_ref)
+        return self.compare_snapshots(self.load_data(old_ref), self.load_data(new_ref))
+    
+    @timed("history")
+    def get_history(self, username: str, limit: int = 10) -> List[Dict]:
+        """Изменения между последними limit + 1 снимками, от старых к новым, за один проход"""
+        if self.store is not None:
+            return self.store.history(username, limit)
+        
+        files = self.catalog.files(username, DATA, limit=limit + 1)
+        history = []
+        previous = None
+        for file_info in reversed(files):
+            path = file_info["path"]
+            if is_stream_snapshot(path):
+                # Снимки gzip NDJSON загружаются, только если соседний снимок в JSON
+                current = {"timestamp": SnapshotReader(path).header["timestamp"], "path": path}
+            else:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                # Файлы сохраняются отсортированными, sorted здесь почти бесплатен
+                current = {
+                    "timestamp": data["timestamp"],
+                    "followers": sorted(data["followers"]),
+                    "following": sorted(data["following"]),
+                    "ids": _get_ids(data)
+                }
+            if previous is not None:
+                if "ids" not in previous and "ids" not in current:
+                    entry = compare_snapshot_files(previous["path"], current["path"])
+                else:
+                    # Снимок gzip NDJSON рядом с JSON загружается до выбора способа сравнения
+                    _load_history_item(previous)
+                    _load_history_item(current)
+                    if previous["ids"] is not None and current["ids"] is not None:
+                        entry = _compare_ids(previous["ids"], current["ids"])
+                    else:
+                        new_followers, unfollowers = _diff_sorted(previous["followers"], current["followers"])
+                        new_following, unfollowed = _diff_sorted(previous["following"], current["following"])
+                        entry = {
+                            "new_followers": new_followers,
+                            "unfollowers": unfollowers,
+                            "new_following": new_following,
+                            "unfollowed": unfollowed,
+                            "renamed": []
+                        }
+                entry["timestamp"] = current["timestamp"]
+                entry["compared_with"] = previous["timestamp"]
+                history.append(entry)
+            previous = current
+        return history
+    
+    @timed("save")
     def save_comparison(self, username: str, comparison_data: Dict) -> str:
         """Сохраняет результаты сравнения в отдельный файл"""
         timestamp = datetime.now()
-        filename = os.path.join(self.data_dir, f"{username}_comparison_{timestamp.strftime('%Y-%m-%d_%H-%M')}.json")
+        filename = self._get_unique_path(f"{username}_comparison_{timestamp.strftime('%Y-%m-%d_%H-%M')}")
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(comparison_data, f, ensure_ascii=False, indent=2)
+        self.count("bytes_written", os.path.getsize(filename))
+        self.catalog.add(username, COMPARISON, timestamp, filename)
         return filename 
\ No newline at end of file
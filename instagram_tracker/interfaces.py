@@ -1,8 +1,21 @@
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import time
 from abc import ABC, abstractmethod
-from typing import Set, List
+from contextlib import contextmanager
+from typing import Callable, Iterator, Set, List, Tuple, Union
+from .user_ids import UserIdSet
+
+class IncompleteFetchError(Exception):
+    """A follower or following list could not be fetched in full; partial lists are never returned"""
 
 class InstagramDataStrategy(ABC):
-    """Strategy interface for different methods of retrieving Instagram data"""
+    """Strategy interface for different methods of retrieving Instagram data.
+    Optional capabilities are plain methods that a strategy defines only if it supports them,
+    and callers check for them with hasattr:
+    get_relationship_ids(username) - followers and following keyed by stable user pk (UserIdSet);
+    clone() - another strategy on the same login that may run in a thread of its own;
+    get_profile(username) - public profile details: counts, privacy, verification, last post"""
     
     @abstractmethod
     def login(self, username: str, password: str) -> bool:
@@ -18,6 +31,11 @@ class InstagramDataStrategy(ABC):
     def get_following(self, username: str) -> Set[str]:
         """Get set of users being followed"""
         pass
+    
+    def get_relationships(self, username: str) -> Tuple[Set[str], Set[str]]:
+        """Get followers and following together; strategies may fetch them concurrently"""
+        return self.get_followers(username), self.get_following(username)
+    
 
 class ProgressObserver(ABC):
     """Observer interface for progress updates"""
@@ -26,6 +44,19 @@ class ProgressObserver(ABC):
     def update_progress(self, message: str, percentage: float = None):
         """Update progress status"""
         pass
+    
+    def record_progress(self, message: str, percentage: float = None):
+        """A frequent progress update, such as users processed so far; observers that do not
+        throttle show it like any other message"""
+        self.update_progress(message, percentage)
+    
+    def record_span(self, name: str, seconds: float):
+        """A timed operation finished; observers that keep no metrics ignore it"""
+        pass
+    
+    def record_count(self, name: str, value: float = 1):
+        """A counter went up; observers that keep no metrics ignore it"""
+        pass
 
 class ProgressSubject(ABC):
     """Subject interface for the Observer pattern"""
@@ -42,4 +73,54 @@ class ProgressSubject(ABC):
     
     def notify(self, message: str, percentage: float = None):
         for observer in self._observers:
-            observer.update_progress(message, percentage) 
\ No newline at end of file
+            observer.update_progress(message, percentage)
+    
+    def progress(self, message: str, percentage: float = None):
+        """Report a frequent progress update that observers may throttle; use notify for status
+        and error messages that must always be shown"""
+        for observer in self._observers:
+            observer.record_progress(message, percentage)
+    
+    def count(self, name: str, value: float = 1):
+        for observer in self._observers:
+            observer.record_count(name, value)
+    
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """Time the enclosed block and report it to observers, even if it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self._observers:
+                seconds = time.perf_counter() - started
+                for observer in self._observers:
+                    observer.record_span(name, seconds)
+
+def timed(name: str) -> Callable:
+    """Report every call of a ProgressSubject method as a span with the given name"""
+    def decorator(method: Callable) -> Callable:
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.span(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+def fetch_relationships(strategy: InstagramDataStrategy,
+                        username: str) -> Tuple[Union[Set[str], UserIdSet], Union[Set[str], UserIdSet]]:
+    """Followers and following keyed by pk if the strategy provides pks, otherwise by username"""
+    if hasattr(strategy, "get_relationship_ids"):
+        return strategy.get_relationship_ids(username)
+    return strategy.get_relationships(username)
+
+def fetch_relationship_ids(strategy: InstagramDataStrategy, username: str) -> Tuple[UserIdSet, UserIdSet]:
+    """Fetch followers on the strategy and, at the same time, following on its clone. The clone shares
+    the rate limiter, so the number of paced requests stays the same: at the configured delay the run
+    still takes about (follower pages + following pages) * delay. Only the response time of one list
+    overlaps the pacing wait of the other, which pays off only when a response takes longer than the delay
+    (see benchmarks/bench_pipeline.py --concurrency)"""
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        following = executor.submit(strategy.clone().get_following_ids, username)
+        followers = strategy.get_follower_ids(username)
+        return followers, following.result()
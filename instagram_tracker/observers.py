@@ -1,4 +1,11 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict
 from .interfaces import ProgressObserver
+from config import PROGRESS_RATE, METRICS_FLUSH_INTERVAL
 
 class ConsoleProgressObserver(ProgressObserver):
     """Concrete observer that displays progress in the console"""
@@ -7,4 +14,109 @@ class ConsoleProgressObserver(ProgressObserver):
         if percentage is not None:
             print(f"{message} - {percentage:.1f}%")
         else:
-            print(message) 
\ No newline at end of file
+            print(message)
+
+class ThrottledProgressObserver(ProgressObserver):
+    """Forwards frequent progress updates to another observer at most max_per_second times a second;
+    status messages and the final 100% always go through"""
+    
+    def __init__(self, observer: ProgressObserver, max_per_second: float = PROGRESS_RATE):
+        self.observer = observer
+        self.interval = 1 / max_per_second if max_per_second > 0 else 0
+        self._last = float("-inf")
+        self._lock = threading.Lock()
+    
+    def update_progress(self, message: str, percentage: float = None):
+        self.observer.update_progress(message, percentage)
+    
+    def record_progress(self, message: str, percentage: float = None):
+        if percentage is None or percentage < 100:
+            now = time.monotonic()
+            with self._lock:
+                if now - self._last < self.interval:
+                    return
+                self._last = now
+        self.observer.record_progress(message, percentage)
+    
+    def record_span(self, name: str, seconds: float):
+        self.observer.record_span(name, seconds)
+    
+    def record_count(self, name: str, value: float = 1):
+        self.observer.record_count(name, value)
+
+class MetricsObserver(ProgressObserver):
+    """Collects spans and counters and writes them to a JSON or Prometheus textfile
+    (chosen by a .prom extension), rewriting it at most every flush_interval seconds"""
+    
+    PREFIX = "instagram_tracker"
+    
+    def __init__(self, path: str, flush_interval: float = METRICS_FLUSH_INTERVAL):
+        self.path = path
+        self.prometheus = path.endswith(".prom")
+        self.flush_interval = flush_interval
+        self.counters: Dict[str, float] = {}
+        self.spans: Dict[str, Dict[str, float]] = {}
+        self.started = datetime.now()
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+    
+    def update_progress(self, message: str, percentage: float = None):
+        pass
+    
+    def record_span(self, name: str, seconds: float):
+        with self._lock:
+            span = self.spans.setdefault(name, {"count": 0, "seconds": 0.0, "max_seconds": 0.0})
+            span["count"] += 1
+            span["seconds"] += seconds
+            span["max_seconds"] = max(span["max_seconds"], seconds)
+        self._maybe_flush()
+    
+    def record_count(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+        self._maybe_flush()
+    
+    def _maybe_flush(self):
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+    
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "started": self.started.isoformat(timespec="seconds"),
+                "updated": datetime.now().isoformat(timespec="seconds"),
+                "counters": dict(self.counters),
+                "spans": {name: dict(span) for name, span in self.spans.items()}
+            }
+    
+    def _format_prometheus(self, metrics: Dict) -> str:
+        lines = []
+        for name, value in sorted(metrics["counters"].items()):
+            lines.append(f"# TYPE {self.PREFIX}_{name}_total counter")
+            lines.append(f"{self.PREFIX}_{name}_total {value}")
+        if metrics["spans"]:
+            lines.append(f"# TYPE {self.PREFIX}_span_seconds summary")
+            for name, span in sorted(metrics["spans"].items()):
+                lines.append(f'{self.PREFIX}_span_seconds_sum{{span="{name}"}} {span["seconds"]:.6f}')
+                lines.append(f'{self.PREFIX}_span_seconds_count{{span="{name}"}} {span["count"]}')
+            lines.append(f"# TYPE {self.PREFIX}_span_max_seconds gauge")
+            for name, span in sorted(metrics["spans"].items()):
+                lines.append(f'{self.PREFIX}_span_max_seconds{{span="{name}"}} {span["max_seconds"]:.6f}')
+        return "\n".join(lines) + "\n"
+    
+    def flush(self):
+        """Write the metrics file atomically, so a collector never reads half of it"""
+        with self._flush_lock:
+            metrics = self.snapshot()
+            self._last_flush = time.monotonic()
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                if self.prometheus:
+                    f.write(self._format_prometheus(metrics))
+                else:
+                    json.dump(metrics, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
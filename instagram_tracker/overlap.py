@@ -0,0 +1,159 @@
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+from .interfaces import ProgressSubject, timed
+from .data_manager import InstagramDataManager
+from .stream_snapshot import FOLLOWERS, SnapshotReader, is_stream_snapshot
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, without it ids are assigned in plain Python
+    np = None
+
+def _bit_count(bits: int) -> int:
+    return bits.bit_count() if hasattr(bits, "bit_count") else bin(bits).count("1")
+
+def _iter_bits(bits: int) -> Iterable[int]:
+    """Positions of the set bits, scanning the integer a byte at a time"""
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    for offset, byte in enumerate(data):
+        while byte:
+            low = byte & -byte
+            yield offset * 8 + low.bit_length() - 1
+            byte ^= low
+
+class OverlapAnalyzer(ProgressSubject):
+    """Audience overlap across several tracked accounts, computed from their latest stored snapshots.
+    Every user gets a dense integer id and every account becomes a bitset (a Python int) over those ids,
+    so intersections and differences are single big-integer operations"""
+
+    def __init__(self, data_manager: InstagramDataManager, relation: str = FOLLOWERS):
+        super().__init__()
+        self.data_manager = data_manager
+        self.relation = relation
+        self.accounts: List[str] = []
+        self.timestamps: Dict[str, str] = {}
+        self.bitsets: Dict[str, int] = {}
+        self.names: List[str] = []
+
+    def _read_users(self, username: str) -> Optional[Tuple[str, Optional[List[int]], List[str]]]:
+        """Latest snapshot of the account as (timestamp, pks, usernames); pks are None for old snapshots"""
+        ref = self.data_manager.get_snapshot_ref(username)
+        if ref is None:
+            return None
+        if is_stream_snapshot(ref):
+            # Read the section lazily instead of building both sets of the snapshot
+            reader = SnapshotReader(ref)
+            pairs = list(reader.iter_users(self.relation))
+            return reader.header["timestamp"], [pk for pk, _ in pairs], [name for _, name in pairs]
+        data = self.data_manager.load_data(ref)
+        ids = data.get("follower_ids" if self.relation == FOLLOWERS else "following_ids")
+        if ids is not None:
+            return data["timestamp"], list(ids.pks), [ids.names[pk] for pk in ids.pks]
+        return data["timestamp"], None, sorted(data[self.relation])
+
+    @timed("overlap_load")
+    def load(self, usernames: Sequence[str]) -> List[str]:
+        """Load the latest snapshot of every account and build the bitsets; returns accounts without snapshots"""
+        loaded, missing = [], []
+        for username in dict.fromkeys(usernames):
+            users = self._read_users(username)
+            if users is None:
+                missing.append(username)
+                continue
+            self.notify(f"Загружен снимок {username} от {users[0]}: {len(users[2])} пользователей")
+            loaded.append((username, users))
+
+        # Users are matched by pk only if every snapshot has pks, otherwise by username
+        by_pk = all(pks is not None for _, (_, pks, _) in loaded)
+        columns = [pks if by_pk else names for _, (_, pks, names) in loaded]
+        ids = self._assign_ids(columns, [names for _, (_, _, names) in loaded], by_pk)
+
+        self.accounts = [username for username, _ in loaded]
+        self.timestamps = {username: users[0] for username, users in loaded}
+        self.bitsets = {username: self._to_bitset(account_ids) for username, account_ids in zip(self.accounts, ids)}
+        return missing
+
+    def _assign_ids(self, columns: List[List[Hashable]], names: List[List[str]],
+                    by_pk: bool) -> List[Iterable[int]]:
+        """Map every distinct key to a dense id 0..N-1 and fill self.names with the matching usernames"""
+        self.names = []
+        if np is not None and by_pk and columns:
+            keys = np.concatenate([np.asarray(column, dtype=np.int64) for column in columns])
+            unique, inverse = np.unique(keys, return_inverse=True)
+            flat_names = [name for column in names for name in column]
+            self.names = [""] * len(unique)
+            for index, name in zip(inverse.tolist(), flat_names):
+                self.names[index] = name
+            bounds = np.cumsum([0] + [len(column) for column in columns])
+            return [inverse[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+        dense: Dict[Hashable, int] = {}
+        result = []
+        for column, column_names in zip(columns, names):
+            account_ids = []
+            for key, name in zip(column, column_names):
+                index = dense.get(key)
+                if index is None:
+                    index = dense[key] = len(self.names)
+                    self.names.append(name)
+                account_ids.append(index)
+            result.append(account_ids)
+        return result
+
+    def _to_bitset(self, account_ids: Iterable[int]) -> int:
+        """Set the bits of the given dense ids in one integer"""
+        if np is not None:
+            flags = np.zeros(len(self.names), dtype=bool)
+            flags[np.asarray(account_ids, dtype=np.int64)] = True
+            return int.from_bytes(np.packbits(flags, bitorder="little").tobytes(), "little")
+        data = bytearray((len(self.names) + 7) // 8)
+        for index in account_ids:
+            data[index >> 3] |= 1 << (index & 7)
+        return int.from_bytes(data, "little")
+
+    def _usernames(self, bits: int) -> List[str]:
+        return sorted(self.names[index] for index in _iter_bits(bits))
+
+    @timed("overlap_matrix")
+    def matrix(self) -> List[List[int]]:
+        """N x N matrix of shared users; the diagonal holds the audience size of each account"""
+        bitsets = [self.bitsets[username] for username in self.accounts]
+        size = len(bitsets)
+        result = [[0] * size for _ in range(size)]
+        for i in range(size):
+            result[i][i] = _bit_count(bitsets[i])
+            for j in range(i + 1, size):
+                result[i][j] = result[j][i] = _bit_count(bitsets[i] & bitsets[j])
+        return result
+
+    def shared(self, usernames: Optional[Sequence[str]] = None) -> List[str]:
+        """Users present in every given account (all loaded accounts by default)"""
+        usernames = usernames or self.accounts
+        if not usernames:
+            return []
+        bits = self.bitsets[usernames[0]]
+        for username in usernames[1:]:
+            bits &= self.bitsets[username]
+        return self._usernames(bits)
+
+    def exclusive(self, username: str, excluded: Sequence[str]) -> List[str]:
+        """Users of the account who are in none of the excluded accounts, e.g. a competitor's audience
+        that does not follow us"""
+        bits = self.bitsets[username]
+        for other in excluded:
+            bits &= ~self.bitsets[other]
+        return self._usernames(bits)
+
+    def report(self, ours: Optional[Sequence[str]] = None) -> Dict:
+        """Matrix, users shared by all accounts and, for every other account, its users missing from ours
+        (the first account by default)"""
+        ours = list(ours or self.accounts[:1])
+        return {
+            "relation": self.relation,
+            "accounts": list(self.accounts),
+            "timestamps": dict(self.timestamps),
+            "matrix": self.matrix(),
+            "shared": self.shared(),
+            "ours": ours,
+            "not_ours": {username: self.exclusive(username, ours)
+                         for username in self.accounts if username not in ours}
+        }
@@ -0,0 +1,47 @@
+from typing import Iterable, Iterator, NamedTuple, Optional
+from .interfaces import ProgressSubject
+from config import PROGRESS_EVERY
+
+class UserRecord(NamedTuple):
+    """The fields of an Instagram user that the tracker keeps"""
+    pk: int
+    username: str
+    full_name: str
+    is_private: bool
+    is_verified: bool
+
+class UserRecordStage:
+    """Streaming transform from instagrapi user objects to compact records, reporting progress"""
+
+    def __init__(self, subject: Optional[ProgressSubject] = None, total: Optional[int] = None,
+                 progress_every: int = PROGRESS_EVERY):
+        self.subject = subject
+        self.total = total
+        # With a known total report about once per percent, but never more often than progress_every
+        self.step = max(progress_every, total // 100) if total else progress_every
+        self.count = 0
+        self._next_report = self.step
+
+    def process(self, users: Iterable) -> Iterator[UserRecord]:
+        """Yield a record per user as it arrives, without materializing the input"""
+        for user in users:
+            yield UserRecord(
+                int(user.pk),
+                user.username,
+                getattr(user, 'full_name', None) or "",
+                bool(getattr(user, 'is_private', False)),
+                bool(getattr(user, 'is_verified', False))
+            )
+            self.count += 1
+            if self.count >= self._next_report:
+                self._next_report += self.step
+                self._report()
+
+    def _report(self):
+        if self.subject is None:
+            return
+        if self.total:
+            self.subject.progress(f"Обработано {self.count} пользователей из {self.total}.",
+                                self.count / self.total * 100)
+        else:
+            self.subject.progress(f"Обработано {self.count} пользователей.")
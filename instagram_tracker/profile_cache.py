@@ -0,0 +1,83 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+from config import PROFILE_CACHE_DB, PROFILE_TTL, PROFILE_CACHE_SIZE
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    username TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS profiles_by_use ON profiles(used_at);
+"""
+
+class ProfileCache:
+    """Кэш профилей в SQLite: записи старше ttl считаются устаревшими, сверх max_entries
+    удаляются давно не использованные"""
+
+    def __init__(self, path: str = PROFILE_CACHE_DB, ttl: float = PROFILE_TTL,
+                 max_entries: int = PROFILE_CACHE_SIZE, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def get_many(self, usernames: Iterable[str]) -> Dict[str, Dict]:
+        """Свежие профили из кэша по именам; время использования найденных обновляется"""
+        usernames = list(usernames)
+        now = self._clock()
+        found = {}
+        with self._lock, self._conn:
+            # SQLite ограничивает число параметров запроса, поэтому имена передаются частями
+            for start in range(0, len(usernames), 500):
+                chunk = usernames[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT username, data FROM profiles WHERE fetched_at > ? "
+                    f"AND username IN ({','.join('?' * len(chunk))})",
+                    [now - self.ttl] + chunk
+                ).fetchall()
+                found.update((username, json.loads(data)) for username, data in rows)
+            self._conn.executemany("UPDATE profiles SET used_at = ? WHERE username = ?",
+                                   ((now, username) for username in found))
+        return found
+
+    def get(self, username: str) -> Optional[Dict]:
+        return self.get_many([username]).get(username)
+
+    def put(self, username: str, profile: Dict):
+        """Сохраняет профиль и вытесняет лишние записи"""
+        now = self._clock()
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO profiles VALUES (?, ?, ?, ?)",
+                               (username, json.dumps(profile, ensure_ascii=False), now, now))
+            self._evict()
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM profiles").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute("""
+                DELETE FROM profiles WHERE username IN (
+                    SELECT username FROM profiles ORDER BY used_at LIMIT ?
+                )
+            """, (count - self.max_entries,))
+
+    def purge_expired(self) -> int:
+        """Удаляет устаревшие записи и возвращает их число"""
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM profiles WHERE fetched_at <= ?",
+                                      (self._clock() - self.ttl,)).rowcount
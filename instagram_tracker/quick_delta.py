@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+from itertools import chain
+from typing import Dict, Iterator, List, Optional, Tuple
+from .interfaces import InstagramDataStrategy, ProgressSubject, fetch_relationships
+from .pipeline import UserRecord
+from .user_ids import UserIdSet
+from config import QUICK_KNOWN_RUN, FULL_RECONCILE_INTERVAL
+
+TIMESTAMP_FORMAT = "%d_%m_%Y_%H_%M"
+
+def read_new_head(pages: Iterator[List[UserRecord]], known: UserIdSet,
+                  known_run: int = QUICK_KNOWN_RUN) -> Tuple[List[UserRecord], bool]:
+    """Read newest-first pages until known_run users in a row are already known;
+    returns the records read and whether the whole list was read"""
+    head = []
+    run = 0
+    reached = False
+    try:
+        for page in pages:
+            for record in page:
+                head.append(record)
+                run = run + 1 if record.pk in known else 0
+                reached = reached or run >= known_run
+            # The page is already paid for, so it is used in full before stopping
+            if reached:
+                return head, False
+        return head, True
+    finally:
+        close = getattr(pages, "close", None)
+        if close is not None:
+            close()
+
+def merge_head(head: List[UserRecord], previous: UserIdSet) -> UserIdSet:
+    """Lay the newest relationships over the stored list: new users are added, renames in the head applied"""
+    return UserIdSet.from_pairs(chain(previous.pairs(), head))
+
+class QuickDeltaFetcher:
+    """Fetches only the newest relationships and merges them into the last snapshot,
+    falling back to a full fetch when the last full one is older than full_interval"""
+
+    def __init__(self, strategy: InstagramDataStrategy, known_run: int = QUICK_KNOWN_RUN,
+                 full_interval: timedelta = timedelta(seconds=FULL_RECONCILE_INTERVAL)):
+        self.strategy = strategy
+        self.known_run = known_run
+        self.full_interval = full_interval
+
+    def _notify(self, message: str):
+        if isinstance(self.strategy, ProgressSubject):
+            self.strategy.notify(message)
+
+    @staticmethod
+    def reconciled_at(snapshot: Dict) -> datetime:
+        """Time of the full fetch the snapshot is based on"""
+        return datetime.strptime(snapshot.get("reconciled_at") or snapshot["timestamp"], TIMESTAMP_FORMAT)
+
+    def needs_full(self, previous: Optional[Dict], now: Optional[datetime] = None) -> bool:
+        if previous is None or "follower_ids" not in previous or "following_ids" not in previous:
+            return True
+        if not hasattr(self.strategy, "iter_follower_records"):
+            return True
+        return (now or datetime.now()) - self.reconciled_at(previous) >= self.full_interval
+
+    def fetch(self, username: str, previous: Optional[Dict]) -> Tuple[UserIdSet, UserIdSet, Optional[datetime]]:
+        """Get followers and following; the third value is set for a quick result and is
+        what InstagramDataManager.save_data expects as reconciled_at"""
+        if self.needs_full(previous):
+            self._notify("Полная сверка подписчиков и подписок...")
+            followers, following = fetch_relationships(self.strategy, username)
+            return followers, following, None
+
+        results = []
+        complete = True
+        fetched = 0
+        for iter_records, known in ((self.strategy.iter_follower_records, previous["follower_ids"]),
+                                    (self.strategy.iter_following_records, previous["following_ids"])):
+            # A quick fetch must not resume from, or leave behind, a checkpoint of a full fetch
+            head, whole = read_new_head(iter_records(username, resume=False), known, self.known_run)
+            results.append(UserIdSet.from_pairs(head) if whole else merge_head(head, known))
+            complete = complete and whole
+            fetched += len(head)
+
+        self._notify(f"Быстрая загрузка: получено {fetched} пользователей из "
+                     f"{len(results[0]) + len(results[1])}, остальные взяты из снимка от {previous['timestamp']}.")
+        return results[0], results[1], None if complete else self.reconciled_at(previous)
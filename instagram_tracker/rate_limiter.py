@@ -0,0 +1,73 @@
+import math
+import random
+import threading
+import time
+from typing import Callable, Optional
+from config import (DELAY_BETWEEN_REQUESTS, RETRY_DELAY, RATE_LIMIT_BURST, MAX_BACKOFF,
+                    MIN_RATE_FACTOR, RATE_RECOVERY_STEP)
+
+class AdaptiveRateLimiter:
+    """Token bucket that paces every request and adapts to throttling"""
+
+    def __init__(self, delay: float = DELAY_BETWEEN_REQUESTS, burst: int = RATE_LIMIT_BURST,
+                 base_backoff: float = RETRY_DELAY, max_backoff: float = MAX_BACKOFF,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.max_rate = 1.0 / delay if delay > 0 else float("inf")
+        self.rate = self.max_rate
+        self.burst = burst
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._blocked_until = 0.0
+        self._failures = 0
+
+    def _refill(self, now: float):
+        if now > self._updated:
+            if math.isinf(self.rate):  # delay=0 disables pacing, only backoff pauses remain
+                self._tokens = float(self.burst)
+            else:
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+                wait = self._blocked_until - now
+                if wait <= 0:
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+    def on_success(self):
+        """Speed back up after a request went through"""
+        with self._lock:
+            self._failures = 0
+            self.rate = min(self.max_rate, self.rate + self.max_rate * RATE_RECOVERY_STEP)
+
+    def on_throttled(self, retry_after: Optional[float] = None) -> float:
+        """Slow down after a rate limit error and return the pause before the next request"""
+        with self._lock:
+            self._failures += 1
+            self.rate = max(self.max_rate * MIN_RATE_FACTOR, self.rate / 2)
+            if retry_after is not None:
+                delay = retry_after
+            else:
+                backoff = min(self.max_backoff, self.base_backoff * 2 ** (self._failures - 1))
+                delay = random.uniform(backoff / 2, backoff)
+            now = self._clock()
+            # Drain the bucket so the whole pool waits out the pause, not just this caller
+            self._refill(now)
+            self._tokens = 0.0
+            self._blocked_until = max(self._blocked_until, now + delay)
+            self._updated = self._blocked_until
+            return delay
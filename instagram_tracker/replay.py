@@ -0,0 +1,179 @@
+import copy
+import random
+import time
+from array import array
+from types import SimpleNamespace
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from .interfaces import InstagramDataStrategy, ProgressSubject
+from .data_manager import InstagramDataManager, Users
+from .rate_limiter import AdaptiveRateLimiter
+from .user_ids import UserIdSet
+from .pipeline import UserRecord, UserRecordStage
+from config import MAX_RETRIES, PAGE_SIZE
+
+class SimulatedRateLimitError(Exception):
+    """Raised by SyntheticStrategy to imitate Instagram throttling"""
+
+    def __init__(self, retry_after: Optional[float] = None):
+        super().__init__("rate limit (simulated)")
+        self.retry_after = retry_after
+
+class ReplayStrategy(InstagramDataStrategy, ProgressSubject):
+    """Serves followers and following from saved snapshots instead of Instagram"""
+
+    def __init__(self, data_manager: InstagramDataManager, snapshot_path: Optional[str] = None):
+        super().__init__()
+        self.data_manager = data_manager
+        self.snapshot_path = snapshot_path
+
+    def login(self, username: str, password: str) -> bool:
+        return True
+
+    def _load(self, username: str) -> Dict:
+        if self.snapshot_path:
+            data = self.data_manager.load_data(self.snapshot_path)
+        else:
+            data = self.data_manager.get_latest_snapshot(username)
+        if data is None:
+            raise ValueError(f"Нет сохраненных снимков для {username}")
+        self.notify(f"Снимок от {data['timestamp']}: {len(data['followers'])} подписчиков, "
+                    f"{len(data['following'])} подписок.")
+        return data
+
+    def get_followers(self, username: str) -> Set[str]:
+        return set(self._load(username)["followers"])
+
+    def get_following(self, username: str) -> Set[str]:
+        return set(self._load(username)["following"])
+
+    def get_relationships(self, username: str) -> Tuple[Set[str], Set[str]]:
+        data = self._load(username)
+        return set(data["followers"]), set(data["following"])
+
+    def get_relationship_ids(self, username: str) -> Tuple[Users, Users]:
+        """Followers and following keyed by pk; a snapshot saved without pks only has usernames"""
+        data = self._load(username)
+        if "follower_ids" not in data:
+            return set(data["followers"]), set(data["following"])
+        return data["follower_ids"], data["following_ids"]
+
+class SyntheticStrategy(InstagramDataStrategy, ProgressSubject):
+    """Generates follower graphs of any size with churn, renames, page latency and throttling"""
+
+    def __init__(self, size: int, following_ratio: float = 0.5, overlap: float = 0.6,
+                 churn: float = 0.01, rename_rate: float = 0.001, page_size: int = PAGE_SIZE,
+                 page_latency: float = 0.0, rate_limit_probability: float = 0.0,
+                 rate_limiter: Optional[AdaptiveRateLimiter] = None, seed: int = 0):
+        super().__init__()
+        self.churn = churn
+        self.rename_rate = rename_rate
+        self.page_size = page_size
+        self.page_latency = page_latency
+        self.rate_limit_probability = rate_limit_probability
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter(delay=0, base_backoff=0.01, max_backoff=0.1)
+        self._random = random.Random(seed)
+        self._renamed: Dict[int, str] = {}
+
+        # Relationships are kept oldest first; pages are served newest first, like Instagram does
+        following_size = int(size * following_ratio)
+        mutual = int(following_size * overlap)
+        self._followers = array('q', range(1, size + 1))
+        self._following = array('q', self._random.sample(range(1, size + 1), mutual))
+        self._following.extend(range(size + 1, size + 1 + following_size - mutual))
+        self._next_pk = size + following_size - mutual + 1
+
+    def clone(self) -> "SyntheticStrategy":
+        """The same synthetic account, rate limiter and observers, for a second fetch thread"""
+        return copy.copy(self)
+
+    def _username(self, pk: int) -> str:
+        return self._renamed.get(pk) or f"user{pk}"
+
+    def advance(self, steps: int = 1):
+        """Apply churn: some users leave, new ones arrive at the head, a few get renamed"""
+        for _ in range(steps):
+            for name in ("_followers", "_following"):
+                users = getattr(self, name)
+                changed = max(1, int(len(users) * self.churn)) if self.churn else 0
+                gone = set(self._random.sample(range(len(users)), min(changed, len(users))))
+                users = array('q', (pk for index, pk in enumerate(users) if index not in gone))
+                users.extend(range(self._next_pk, self._next_pk + changed))
+                self._next_pk += changed
+                setattr(self, name, users)
+            renames = int(len(self._followers) * self.rename_rate)
+            for index in self._random.sample(range(len(self._followers)), renames):
+                pk = self._followers[index]
+                self._renamed[pk] = f"user{pk}_{self._random.randrange(10 ** 6)}"
+
+    def _fetch_page(self, users: array, start: int) -> List[SimpleNamespace]:
+        """Build a page of user objects shaped like instagrapi's UserShort"""
+        if self.page_latency:
+            time.sleep(self.page_latency)
+        if self.rate_limit_probability and self._random.random() < self.rate_limit_probability:
+            raise SimulatedRateLimitError()
+        end = len(users) - start
+        return [SimpleNamespace(pk=pk, username=self._username(pk), full_name=f"User {pk}",
+                                is_private=pk % 3 == 0, is_verified=pk % 1000 == 0)
+                for pk in reversed(users[max(0, end - self.page_size):end])]
+
+    def _iter_pages(self, users: array) -> Iterator[List[UserRecord]]:
+        """Yield record pages newest first, retrying throttled pages through the limiter"""
+        stage = UserRecordStage(self, total=len(users))
+        start = 0
+        retry_count = 0
+        while start < len(users):
+            with self.span("rate_wait"):
+                self.rate_limiter.acquire()
+            self.count("requests")
+            try:
+                with self.span("page_fetch"):
+                    page = self._fetch_page(users, start)
+            except SimulatedRateLimitError as e:
+                self.count("rate_limit_hits")
+                if retry_count >= MAX_RETRIES:
+                    raise
+                self.rate_limiter.on_throttled(e.retry_after)
+                self.count("retries")
+                retry_count += 1
+                continue
+            self.rate_limiter.on_success()
+            retry_count = 0
+            start += len(page)
+            with self.span("process"):
+                records = list(stage.process(page))
+            yield records
+
+    def iter_follower_records(self, username: str, resume: bool = True) -> Iterator[List[UserRecord]]:
+        return self._iter_pages(self._followers)
+
+    def iter_following_records(self, username: str, resume: bool = True) -> Iterator[List[UserRecord]]:
+        return self._iter_pages(self._following)
+
+    def login(self, username: str, password: str) -> bool:
+        return True
+
+    def get_follower_ids(self, username: str) -> UserIdSet:
+        return UserIdSet.from_pairs(record for page in self.iter_follower_records(username) for record in page)
+
+    def get_following_ids(self, username: str) -> UserIdSet:
+        return UserIdSet.from_pairs(record for page in self.iter_following_records(username) for record in page)
+
+    def get_followers(self, username: str) -> Set[str]:
+        return self.get_follower_ids(username).usernames()
+
+    def get_following(self, username: str) -> Set[str]:
+        return self.get_following_ids(username).usernames()
+
+    def get_relationship_ids(self, username: str) -> Tuple[UserIdSet, UserIdSet]:
+        return self.get_follower_ids(username), self.get_following_ids(username)
+
+    def get_profile(self, username: str) -> Dict:
+        self.rate_limiter.acquire()
+        if self.page_latency:
+            time.sleep(self.page_latency)
+        self.rate_limiter.on_success()
+        pk = int(username[4:].split("_")[0]) if username.startswith("user") else 0
+        return {"username": username, "pk": pk, "full_name": f"User {pk}",
+                "follower_count": pk * 7 % 100000, "following_count": pk * 3 % 5000,
+                "media_count": pk % 500, "is_private": pk % 3 == 0, "is_verified": pk % 1000 == 0,
+                "last_post": None}
@@ -0,0 +1,40 @@
+import json
+import os
+from typing import Dict, Optional
+from config import SESSION_DIR
+
+class SessionStore:
+    """Keeps instagrapi client settings and cookies between runs"""
+
+    def __init__(self, directory: str = SESSION_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _get_path(self, username: str) -> str:
+        return os.path.join(self.directory, f"{username}.json")
+
+    def load(self, username: str) -> Optional[Dict]:
+        """Return saved settings for the login, or None"""
+        path = self._get_path(username)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, username: str, settings: Dict):
+        """Atomically save settings; the file holds cookies, so only the owner can read it"""
+        path = self._get_path(username)
+        tmp_path = path + ".tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(settings, f)
+        os.replace(tmp_path, path)
+
+    def clear(self, username: str):
+        """Forget the saved session for the login"""
+        path = self._get_path(username)
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,354 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+from config import SNAPSHOT_DB, KEYFRAME_INTERVAL
+from .user_ids import UserIdSet
+from .catalog import parse_data_filename
+from .stream_snapshot import SnapshotReader, is_stream_snapshot
+
+FOLLOWERS = 0
+FOLLOWING = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    username TEXT NOT NULL,
+    pk INTEGER
+);
+CREATE UNIQUE INDEX IF NOT EXISTS users_by_pk ON users(pk, username) WHERE pk IS NOT NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS users_by_name ON users(username) WHERE pk IS NULL;
+CREATE INDEX IF NOT EXISTS users_by_username ON users(username);
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    target_id INTEGER NOT NULL REFERENCES users(id),
+    taken_at TEXT NOT NULL,
+    base_id INTEGER REFERENCES snapshots(id),
+    depth INTEGER NOT NULL,
+    followers_count INTEGER NOT NULL,
+    following_count INTEGER NOT NULL,
+    reconciled_at TEXT,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS snapshots_by_target ON snapshots(target_id, taken_at);
+CREATE INDEX IF NOT EXISTS snapshots_by_source ON snapshots(source);
+CREATE TABLE IF NOT EXISTS snapshot_changes (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots(id),
+    relation INTEGER NOT NULL,
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    added INTEGER NOT NULL,
+    PRIMARY KEY (snapshot_id, relation, user_id)
+) WITHOUT ROWID;
+"""
+
+def _get_keys(users: Union[Set[str], UserIdSet]) -> Set[Tuple[Optional[int], str]]:
+    """Пары (pk, имя) пользователей; для множества имен pk неизвестен"""
+    if isinstance(users, UserIdSet):
+        return set(users.pairs())
+    return {(None, name) for name in users}
+
+class SQLiteSnapshotStore:
+    """Хранилище снимков в SQLite: имена хранятся один раз, снимки - как изменения относительно предыдущего"""
+
+    def __init__(self, path: str = SNAPSHOT_DB, keyframe_interval: int = KEYFRAME_INTERVAL):
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def _intern(self, users: Iterable[Tuple[Optional[int], str]]) -> Dict[Tuple[Optional[int], str], int]:
+        """Возвращает id строки users для каждой пары (pk, имя), добавляя новые пары в таблицу.
+        Строка - это аккаунт под конкретным именем: при смене имени или передаче имени другому аккаунту
+        появляется новая строка, а pk уже сохраненных строк не переписывается. pk None - пользователь
+        известен только по имени; такая строка один раз получает pk, когда он становится известен"""
+        self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS incoming (pk INTEGER, username TEXT NOT NULL)")
+        self._conn.execute("DELETE FROM incoming")
+        self._conn.executemany("INSERT INTO incoming VALUES (?, ?)", users)
+        self._conn.execute("""
+            UPDATE users SET pk = (SELECT i.pk FROM incoming i WHERE i.username = users.username AND i.pk IS NOT NULL)
+            WHERE pk IS NULL
+              AND username IN (SELECT username FROM incoming WHERE pk IS NOT NULL)
+              AND NOT EXISTS (SELECT 1 FROM incoming i JOIN users u ON u.username = i.username AND u.pk = i.pk
+                              WHERE i.username = users.username)
+        """)
+        self._conn.execute("""
+            INSERT INTO users (pk, username)
+            SELECT DISTINCT pk, username FROM incoming i
+            WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.username = i.username AND u.pk IS i.pk)
+        """)
+        rows = self._conn.execute("""
+            SELECT DISTINCT i.pk, i.username, u.id FROM incoming i
+            JOIN users u ON u.username = i.username AND u.pk IS i.pk
+        """)
+        return {(pk, username): user_id for pk, username, user_id in rows}
+
+    def _load_members(self, snapshot_id: int) -> Tuple[Set[int], Set[int]]:
+        """Восстанавливает состав снимка, применяя изменения от ближайшего полного снимка"""
+        rows = self._conn.execute("""
+            WITH RECURSIVE chain(id, base_id, depth) AS (
+                SELECT id, base_id, depth FROM snapshots WHERE id = ?
+                UNION ALL
+                SELECT s.id, s.base_id, s.depth FROM snapshots s JOIN chain c ON s.id = c.base_id
+            )
+            SELECT ch.relation, ch.user_id, ch.added
+            FROM chain c JOIN snapshot_changes ch ON ch.snapshot_id = c.id
+            ORDER BY c.depth
+        """, (snapshot_id,))
+        members = (set(), set())
+        for relation, user_id, added in rows:
+            if added:
+                members[relation].add(user_id)
+            else:
+                members[relation].discard(user_id)
+        return members
+
+    def _find_snapshot(self, target: str, before: Optional[str] = None) -> Optional[Tuple]:
+        query = """
+            SELECT s.id, s.taken_at, s.depth FROM snapshots s JOIN users u ON u.id = s.target_id
+            WHERE u.username = ?
+        """
+        params = [target]
+        if before is not None:
+            query += " AND s.taken_at <= ?"
+            params.append(before)
+        query += " ORDER BY s.taken_at DESC, s.id DESC LIMIT 1"
+        return self._conn.execute(query, params).fetchone()
+
+    def save_snapshot(self, username: str, followers: Union[Set[str], UserIdSet],
+                      following: Union[Set[str], UserIdSet], taken_at: Optional[datetime] = None,
+                      reconciled_at: Optional[datetime] = None, source: Optional[str] = None) -> int:
+        """Сохраняет снимок и возвращает его id; для UserIdSet запоминает pk пользователей.
+        reconciled_at задается для быстрых снимков: время последней полной загрузки, на которой они основаны;
+        source - имя файла, из которого импортирован снимок"""
+        taken_at_str = (taken_at or datetime.now()).isoformat(timespec="seconds")
+        reconciled_at_str = reconciled_at.isoformat(timespec="seconds") if reconciled_at else None
+        followers, following = _get_keys(followers), _get_keys(following)
+        
+        with self._lock, self._conn:
+            ids = self._intern(followers | following | {(None, username)})
+            new_members = ({ids[key] for key in followers}, {ids[key] for key in following})
+
+            base = self._find_snapshot(username, taken_at_str)
+            if base is not None and base[2] + 1 < self.keyframe_interval:
+                base_id, depth = base[0], base[2] + 1
+                old_members = self._load_members(base_id)
+            else:
+                base_id, depth = None, 0
+                old_members = (set(), set())
+
+            cursor = self._conn.execute(
+                "INSERT INTO snapshots (target_id, taken_at, base_id, depth, followers_count, following_count, "
+                "reconciled_at, source) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (ids[(None, username)], taken_at_str, base_id, depth, len(followers), len(following),
+                 reconciled_at_str, source)
+            )
+            snapshot_id = cursor.lastrowid
+
+            changes = []
+            for relation in (FOLLOWERS, FOLLOWING):
+                changes.extend((snapshot_id, relation, user_id, 1)
+                               for user_id in new_members[relation] - old_members[relation])
+                changes.extend((snapshot_id, relation, user_id, 0)
+                               for user_id in old_members[relation] - new_members[relation])
+            self._conn.executemany("INSERT INTO snapshot_changes VALUES (?, ?, ?, ?)", changes)
+            return snapshot_id
+
+    def load_snapshot(self, snapshot_id: int) -> Optional[Dict]:
+        """Загружает снимок в том же виде, что и InstagramDataManager.load_data"""
+        with self._lock:
+            row = self._conn.execute("""
+                SELECT u.username, s.taken_at, s.reconciled_at FROM snapshots s JOIN users u ON u.id = s.target_id
+                WHERE s.id = ?
+            """, (snapshot_id,)).fetchone()
+            if row is None:
+                return None
+            followers_ids, following_ids = self._load_members(snapshot_id)
+            users = self._get_users(followers_ids | following_ids)
+
+        followers = {users[user_id][0] for user_id in followers_ids}
+        following = {users[user_id][0] for user_id in following_ids}
+        data = {
+            "username": row[0],
+            "timestamp": datetime.fromisoformat(row[1]).strftime("%d_%m_%Y_%H_%M"),
+            "snapshot_id": snapshot_id,
+            "followers": followers,
+            "following": following,
+            "stats": {
+                "followers_count": len(followers),
+                "following_count": len(following)
+            }
+        }
+        if row[2] is not None:
+            data["quick"] = True
+            data["reconciled_at"] = datetime.fromisoformat(row[2]).strftime("%d_%m_%Y_%H_%M")
+        if all(pk is not None for _, pk in users.values()):
+            names = {}
+            data["follower_ids"] = UserIdSet.from_pairs(
+                ((users[user_id][1], users[user_id][0]) for user_id in followers_ids), names)
+            data["following_ids"] = UserIdSet.from_pairs(
+                ((users[user_id][1], users[user_id][0]) for user_id in following_ids), names)
+        return data
+
+    def _get_users(self, user_ids: Set[int]) -> Dict[int, Tuple[str, Optional[int]]]:
+        """Имя и pk (если известен) для каждого id"""
+        self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS wanted (id INTEGER PRIMARY KEY)")
+        self._conn.execute("DELETE FROM wanted")
+        self._conn.executemany("INSERT INTO wanted VALUES (?)", ((user_id,) for user_id in user_ids))
+        rows = self._conn.execute("SELECT users.id, users.username, users.pk FROM wanted JOIN users USING (id)")
+        return {user_id: (username, pk) for user_id, username, pk in rows}
+
+    def latest_snapshot(self, username: str) -> Optional[Dict]:
+        """Последний снимок пользователя"""
+        return self.snapshot_at(username, None)
+
+    def snapshot_at(self, username: str, when: Optional[datetime]) -> Optional[Dict]:
+        """Последний снимок пользователя, сделанный не позже указанного времени"""
+        with self._lock:
+            row = self._find_snapshot(username, when.isoformat(timespec="seconds") if when else None)
+        return self.load_snapshot(row[0]) if row else None
+
+    def list_snapshots(self, username: str) -> List[Dict]:
+        """Список снимков пользователя, от новых к старым"""
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT s.id, s.taken_at, s.followers_count, s.following_count
+                FROM snapshots s JOIN users u ON u.id = s.target_id
+                WHERE u.username = ? ORDER BY s.taken_at DESC, s.id DESC
+            """, (username,)).fetchall()
+        return [{
+            "snapshot_id": snapshot_id,
+            "timestamp": datetime.fromisoformat(taken_at),
+            "followers_count": followers_count,
+            "following_count": following_count
+        } for snapshot_id, taken_at, followers_count, following_count in rows]
+
+    def history(self, username: str, limit: int = 10) -> List[Dict]:
+        """Изменения между последними limit + 1 снимками, от старых к новым, по сохраненным изменениям"""
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT s.id, s.taken_at, s.base_id FROM snapshots s JOIN users u ON u.id = s.target_id
+                WHERE u.username = ? ORDER BY s.taken_at DESC, s.id DESC LIMIT ?
+            """, (username, limit + 1)).fetchall()
+            rows.reverse()
+            if len(rows) < 2:
+                return []
+
+            members = self._load_members(rows[0][0])
+            steps = []
+            for previous, current in zip(rows, rows[1:]):
+                # added/removed по отношениям: ((added, removed) подписчиков, (added, removed) подписок)
+                diff = (([], []), ([], []))
+                if current[2] == previous[0]:
+                    changes = self._conn.execute(
+                        "SELECT relation, user_id, added FROM snapshot_changes WHERE snapshot_id = ?",
+                        (current[0],)
+                    )
+                    for relation, user_id, added in changes:
+                        if added:
+                            members[relation].add(user_id)
+                            diff[relation][0].append(user_id)
+                        else:
+                            members[relation].discard(user_id)
+                            diff[relation][1].append(user_id)
+                else:
+                    # Полный снимок или снимок, вставленный не по порядку
+                    new_members = self._load_members(current[0])
+                    for relation in (FOLLOWERS, FOLLOWING):
+                        diff[relation][0].extend(new_members[relation] - members[relation])
+                        diff[relation][1].extend(members[relation] - new_members[relation])
+                    members = new_members
+                steps.append((previous[1], current[1], diff))
+
+            users = self._get_users({user_id for _, _, diff in steps
+                                     for relation in diff for ids in relation for user_id in ids})
+
+        history = []
+        for previous_taken_at, taken_at, diff in steps:
+            # Строка пользователя со старым именем ушла, с новым пришла, а pk тот же - это переименование
+            renamed = {}
+            for added, removed in diff:
+                removed_by_pk = {users[user_id][1]: user_id for user_id in removed
+                                 if users[user_id][1] is not None}
+                for user_id in list(added):
+                    old_id = removed_by_pk.get(users[user_id][1])
+                    if old_id is not None:
+                        added.remove(user_id)
+                        removed.remove(old_id)
+                        renamed[users[user_id][1]] = {
+                            "pk": users[user_id][1],
+                            "old_username": users[old_id][0],
+                            "new_username": users[user_id][0]
+                        }
+            history.append({
+                "new_followers": sorted(users[user_id][0] for user_id in diff[FOLLOWERS][0]),
+                "unfollowers": sorted(users[user_id][0] for user_id in diff[FOLLOWERS][1]),
+                "new_following": sorted(users[user_id][0] for user_id in diff[FOLLOWING][0]),
+                "unfollowed": sorted(users[user_id][0] for user_id in diff[FOLLOWING][1]),
+                "renamed": sorted(renamed.values(), key=lambda entry: entry["new_username"]),
+                "timestamp": datetime.fromisoformat(taken_at).strftime("%d_%m_%Y_%H_%M"),
+                "compared_with": datetime.fromisoformat(previous_taken_at).strftime("%d_%m_%Y_%H_%M")
+            })
+        return history
+
+    def import_json(self, file_path: str) -> int:
+        """Импортирует снимок из файла InstagramDataManager (JSON или gzip NDJSON);
+        повторный импорт того же файла не создает дубликат"""
+        if is_stream_snapshot(file_path):
+            data = SnapshotReader(file_path).to_data()
+        else:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        try:
+            taken_at = datetime.strptime(data["timestamp"], "%d_%m_%Y_%H_%M")
+        except (KeyError, ValueError):
+            taken_at = datetime.fromtimestamp(os.path.getmtime(file_path))
+        reconciled_at = None
+        if data.get("reconciled_at"):
+            reconciled_at = datetime.strptime(data["reconciled_at"], "%d_%m_%Y_%H_%M")
+        if "follower_ids" in data and "following_ids" in data:
+            followers, following = data["follower_ids"], data["following_ids"]
+        elif "follower_pks" in data and "following_pks" in data:
+            names = {}
+            followers = UserIdSet.from_pairs(zip(data["follower_pks"], data["followers"]), names)
+            following = UserIdSet.from_pairs(zip(data["following_pks"], data["following"]), names)
+        else:
+            followers, following = set(data["followers"]), set(data["following"])
+        source = os.path.basename(file_path)
+
+        with self._lock:
+            # Снимки, импортированные до появления source, узнаются по времени и размеру
+            existing = self._conn.execute("""
+                SELECT s.id FROM snapshots s JOIN users u ON u.id = s.target_id
+                WHERE u.username = ? AND (s.source = ? OR (s.source IS NULL AND s.taken_at = ?
+                      AND s.followers_count = ? AND s.following_count = ?))
+            """, (data["username"], source, taken_at.isoformat(timespec="seconds"),
+                  len(followers), len(following))).fetchone()
+            if existing:
+                return existing[0]
+            return self.save_snapshot(data["username"], followers, following, taken_at, reconciled_at, source)
+
+    def import_directory(self, data_dir: str) -> List[int]:
+        """Импортирует все снимки из каталога данных в порядке времени съемки, пропуская файлы сравнений"""
+        files = []
+        for filename in os.listdir(data_dir):
+            parsed = parse_data_filename(filename)
+            if parsed is not None:
+                files.append((parsed[1], parsed[2], filename))
+        snapshot_ids = []
+        for _, _, filename in sorted(files):
+            try:
+                snapshot_ids.append(self.import_json(os.path.join(data_dir, filename)))
+            except (OSError, ValueError, KeyError):
+                continue
+        return snapshot_ids
@@ -1,26 +1,141 @@
-import time
-import asyncio
-from typing import Set
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
 from instagrapi import Client
-from instagrapi.exceptions import LoginRequired, ClientError
-from .interfaces import InstagramDataStrategy, ProgressSubject
-from config import DELAY_BETWEEN_REQUESTS, MAX_RETRIES, RETRY_DELAY
+from instagrapi.exceptions import (LoginRequired, ClientError, RateLimitError, PleaseWaitFewMinutes,
+                                   ClientThrottledError, FeedbackRequired, UserNotFound)
+from .interfaces import (IncompleteFetchError, InstagramDataStrategy, ProgressSubject, fetch_relationship_ids,
+                         timed)
+from .checkpoint import FetchCheckpoint
+from .session import SessionStore
+from .rate_limiter import AdaptiveRateLimiter
+from .user_resolver import UserIdResolver
+from .user_ids import UserIdSet
+from .pipeline import UserRecord, UserRecordStage
+from config import MAX_RETRIES, PAGE_SIZE, CHECKPOINT_DIR, ENRICH_LAST_POST
+
+RATE_LIMIT_ERRORS = (RateLimitError, PleaseWaitFewMinutes, ClientThrottledError, FeedbackRequired)
 
 class InstagrapiStrategy(InstagramDataStrategy, ProgressSubject):
     """Concrete strategy using instagrapi library"""
     
-    def __init__(self):
+    def __init__(self, streaming: bool = False, checkpoint_dir: str = CHECKPOINT_DIR,
+                 session_store: Optional[SessionStore] = None,
+                 rate_limiter: Optional[AdaptiveRateLimiter] = None,
+                 resolver: Optional[UserIdResolver] = None):
         super().__init__()
         self.client = Client()
-        self.client.delay_range = [0.5, 1.5]   
+        self.streaming = streaming
+        self.checkpoint_dir = checkpoint_dir
+        self.session_store = session_store
+        # Pacing is done by the limiter, so the client's own random delay is not needed
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter()
+        self.resolver = resolver or UserIdResolver()
+    
+    def clone(self) -> "InstagrapiStrategy":
+        """Another strategy on the same login for use from another thread. An instagrapi Client keeps
+        its cookies and last response and is not safe to share between threads, so the clone gets a
+        Client of its own with the logged-in settings. The rate limiter, pk resolver and observers are
+        shared, so clones together never send requests faster than one strategy would"""
+        other = InstagrapiStrategy(self.streaming, self.checkpoint_dir,
+                                   rate_limiter=self.rate_limiter, resolver=self.resolver)
+        other.client.set_settings(self.client.get_settings())
+        other._observers = self._observers
+        return other
+    
+    @staticmethod
+    def _is_rate_limit_error(error: Exception) -> bool:
+        if isinstance(error, RATE_LIMIT_ERRORS):
+            return True
+        if getattr(getattr(error, 'response', None), 'status_code', None) == 429:
+            return True
+        message = str(error).lower()
+        return "rate limit" in message or "please wait" in message
+    
+    @staticmethod
+    def _get_retry_after(error: Exception) -> Optional[float]:
+        """Read the Retry-After header of the failed response, if there is one"""
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None) or {}
+        try:
+            return float(headers.get('Retry-After'))
+        except (TypeError, ValueError):
+            return None
+    
+    def _call(self, func: Callable, *args, **kwargs):
+        """Send a request through the rate limiter, backing off on throttling"""
+        retry_count = 0
+        while True:
+            with self.span("rate_wait"):
+                self.rate_limiter.acquire()
+            self.count("requests")
+            try:
+                result = func(*args, **kwargs)
+            except ClientError as e:
+                if not self._is_rate_limit_error(e):
+                    raise
+                self.count("rate_limit_hits")
+                if retry_count >= MAX_RETRIES:
+                    self.notify("Достигнуто максимальное количество повторных попыток. Пожалуйста, повторите попытку позже.")
+                    raise
+                wait_time = self.rate_limiter.on_throttled(self._get_retry_after(e))
+                self.notify(f"Скорость ограничена. Подождите {wait_time:.0f} секунды перед повторной попыткой...")
+                self.count("retries")
+                retry_count += 1
+                continue
+            self.rate_limiter.on_success()
+            return result
+    
+    def _restore_session(self, username: str) -> bool:
+        """Reuse saved session settings, validating them with one cheap request. Only an expired
+        session is discarded; a network error or throttling is raised and the saved session stays
+        for the next run"""
+        if self.session_store is None:
+            return False
+        
+        settings = self.session_store.load(username)
+        if not settings:
+            return False
+        
+        self.client.set_settings(settings)
+        try:
+            self._call(self.client.get_timeline_feed)
+        except LoginRequired:
+            self.notify("Сохраненная сессия истекла, выполняем полный вход...")
+            self._reset_session(username)
+            return False
+        # Keep the cookies the check may have refreshed
+        self._save_session(username)
+        self.notify("Сессия восстановлена, вход не требуется.")
+        return True
     
-    def login(self, username: str, password: str) -> bool:
+    def _reset_session(self, username: str):
+        """Drop cookies and login state, in the client and on disk, before a full login"""
+        # Keep the device identity so the full login looks like the same phone
+        uuids = self.client.get_uuids()
+        self.client.set_settings({})
+        self.client.set_uuids(uuids)
+        if self.session_store is not None:
+            self.session_store.clear(username)
+    
+    def _save_session(self, username: str):
+        if self.session_store is not None:
+            self.session_store.save(username, self.client.get_settings())
+    
+    @timed("login")
+    def login(self, username: str, password: str, reuse_session: bool = True) -> bool:
+        """Log in, reusing the saved session if it still works; reuse_session=False always
+        discards it and logs in with the password"""
         try:
             self.notify("Вход в Instagram...")
             
+            if not reuse_session:
+                self._reset_session(username)
+            elif self._restore_session(username):
+                return True
+            
             # Попытка входа
             try:
-                self.client.login(username, password)
+                self._call(self.client.login, username, password)
+                self._save_session(username)
                 self.notify("Успешный вход!")
                 return True
             except Exception as e:
@@ -32,7 +147,8 @@ class InstagrapiStrategy(InstagramDataStrategy, ProgressSubject):
                     code = input("Введите 6-значный код из приложения 2FA: ")
                     
                     try:
-                        self.client.login(username, password, verification_code=code)
+                        self._call(self.client.login, username, password, verification_code=code)
+                        self._save_session(username)
                         self.notify("Успешный вход с 2FA!")
                         return True
                     except Exception as twofa_error:
@@ -47,10 +163,11 @@ class InstagrapiStrategy(InstagramDataStrategy, ProgressSubject):
                     try:
                         # Пытаемся обработать challenge
                         if hasattr(self.client, 'challenge_code_handler'):
-                            self.client.challenge_code_handler(code)
+                            self._call(self.client.challenge_code_handler, code)
                         else:
                             # Альтернативный способ
-                            self.client.login(username, password, verification_code=code)
+                            self._call(self.client.login, username, password, verification_code=code)
+                        self._save_session(username)
                         self.notify("Подтверждение успешно!")
                         return True
                     except Exception as confirm_error:
@@ -65,88 +182,145 @@ class InstagrapiStrategy(InstagramDataStrategy, ProgressSubject):
             self.notify(f"Ошибка входа: {str(e)}")
             return False
     
-    def _handle_rate_limit(self, retry_count: int) -> bool:
-        """Handle rate limiting by waiting and retrying"""
-        if retry_count >= MAX_RETRIES:
-            self.notify("Достигнуто максимальное количество повторных попыток. Пожалуйста, повторите попытку позже.")
-            return False
-        
-        wait_time = RETRY_DELAY * (retry_count + 1)
-        self.notify(f"Скорость ограничена. Подождите {wait_time} секунды перед повторной попыткой...")
-        time.sleep(wait_time)
-        return True
-
-    async def _process_users_batch(self, users_data, batch_size=50):
-        """Process users in batches"""
-        usernames = set()
-        total = len(users_data)
-        current = 0
-        
-        # Разбиваем на батчи для параллельной обработки
-        for i in range(0, total, batch_size):
-            batch = list(users_data.values())[i:i + batch_size]
-            for user in batch:
-                usernames.add(user.username)
-                current += 1
-                if current % 10 == 0:  # Увеличили интервал обновления для уменьшения вывода
-                    percentage = (current / total) * 100 if total > 0 else 0
-                    self.notify(f"Обработано {current} пользователей из {total}.", percentage)
-            await asyncio.sleep(0.1)  # Небольшая пауза между батчами
-        
-        return usernames
+    def _current_username(self, pk: int) -> Optional[str]:
+        """Username the account with this pk has now, None if the account is gone; any other
+        error is left to the resolver, which then keeps using the cached pk"""
+        try:
+            return self._call(self.client.user_info, pk).username
+        except UserNotFound:
+            return None
     
-    def get_followers(self, username: str) -> Set[str]:
-        self.notify("Извлекаем пользователей...")
-        followers = set()
-        retry_count = 0
-        
-        while retry_count < MAX_RETRIES:
+    def _user_id(self, username: str) -> int:
+        """Resolve a username to its pk, sending a request only on the first lookup and when
+        a cached pk is due to be checked against its username again"""
+        with self.span("resolve"):
             try:
-                user_id = self.client.user_id_from_username(username)
-                followers_data = self.client.user_followers(user_id)
-                
-                # Используем асинхронную обработку
-                followers = asyncio.run(self._process_users_batch(followers_data))
-                return followers
-                
-            except ClientError as e:
-                if "rate limit" in str(e).lower():
-                    if not self._handle_rate_limit(retry_count):
-                        break
-                    retry_count += 1
-                    continue
-                self.notify(f"Client error: {str(e)}")
-                break
-            except Exception as e:
-                self.notify(f"Error fetching followers: {str(e)}")
+                return self.resolver.resolve(username,
+                                             lambda name: self._call(self.client.user_id_from_username, name),
+                                             self._current_username)
+            except UserNotFound:
+                self.resolver.forget(username)
+                raise
+    
+    def _iter_pages(self, username: str, relation: str, fetch_chunk: Callable,
+                    resume: bool = True) -> Iterator[List[UserRecord]]:
+        """Yield user records page by page, saving the cursor after every page unless resume is off"""
+        checkpoint = FetchCheckpoint(self.checkpoint_dir, username, relation) if resume else None
+        cursor, fetched = checkpoint.load() if resume else (None, [])
+        count = len(fetched)
+        stage = UserRecordStage(self)
+        if fetched:
+            self.notify(f"Продолжаем с сохраненной позиции, уже получено {count} пользователей.")
+            yield fetched
+            if not cursor:
+                checkpoint.clear()
+                return
+        
+        user_id = self._user_id(username)
+        while True:
+            with self.span("page_fetch"):
+                try:
+                    users, cursor = self._call(fetch_chunk, user_id, max_amount=PAGE_SIZE, max_id=cursor or "")
+                except UserNotFound:
+                    # The cached pk points to a deleted account; the next run looks the name up again
+                    self.resolver.forget(username)
+                    raise
+            with self.span("process"):
+                page = list(stage.process(users))
+            count += len(page)
+            if checkpoint:
+                checkpoint.save_page(page, cursor, count)
+            yield page
+            
+            if not cursor:
                 break
         
-        return followers
+        if checkpoint:
+            checkpoint.clear()
     
-    def get_following(self, username: str) -> Set[str]:
+    def iter_follower_records(self, username: str, resume: bool = True) -> Iterator[List[UserRecord]]:
+        """Stream follower records page by page, newest first, resuming an interrupted fetch"""
+        return self._iter_pages(username, "followers", self.client.user_followers_v1_chunk, resume)
+    
+    def iter_following_records(self, username: str, resume: bool = True) -> Iterator[List[UserRecord]]:
+        """Stream followed user records page by page, newest first, resuming an interrupted fetch"""
+        return self._iter_pages(username, "following", self.client.user_following_v1_chunk, resume)
+    
+    def iter_followers(self, username: str) -> Iterator[List[str]]:
+        """Stream followers page by page, resuming an interrupted fetch"""
+        return ([record.username for record in page] for page in self.iter_follower_records(username))
+    
+    def iter_following(self, username: str) -> Iterator[List[str]]:
+        """Stream followed users page by page, resuming an interrupted fetch"""
+        return ([record.username for record in page] for page in self.iter_following_records(username))
+    
+    def _collect_pages(self, pages: Iterator[List[UserRecord]], resumable: bool = True) -> UserIdSet:
+        """Collect pages into an id set; on error a resumable fetch keeps the fetched pages in its
+        checkpoint for the next run, but the partial list itself is never returned"""
+        pairs = []
+        try:
+            for page in pages:
+                pairs.extend(page)
+        except Exception as e:
+            if resumable:
+                self.notify(f"Ошибка загрузки, прогресс сохранен для повторного запуска: {str(e)}")
+            else:
+                self.notify(f"Ошибка загрузки: {str(e)}")
+            raise IncompleteFetchError(f"загружено только {len(pairs)} пользователей: {e}") from e
+        return UserIdSet.from_pairs(pairs)
+    
+    def get_follower_ids(self, username: str) -> UserIdSet:
+        """Get followers keyed by user pk, one rate-limited request per page"""
         self.notify("Извлекаем пользователей...")
-        following = set()
-        retry_count = 0
-        
-        while retry_count < MAX_RETRIES:
+        pages = self._iter_pages(username, "followers", self.client.user_followers_v1_chunk, resume=self.streaming)
+        return self._collect_pages(pages, self.streaming)
+    
+    def get_following_ids(self, username: str) -> UserIdSet:
+        """Get followed users keyed by user pk, one rate-limited request per page"""
+        self.notify("Извлекаем пользователей...")
+        pages = self._iter_pages(username, "following", self.client.user_following_v1_chunk, resume=self.streaming)
+        return self._collect_pages(pages, self.streaming)
+    
+    def get_followers(self, username: str) -> Set[str]:
+        return self.get_follower_ids(username).usernames()
+    
+    def get_following(self, username: str) -> Set[str]:
+        return self.get_following_ids(username).usernames()
+    
+    def get_relationship_ids(self, username: str) -> Tuple[UserIdSet, UserIdSet]:
+        """Fetch followers and following at the same time, following through a clone"""
+        return fetch_relationship_ids(self, username)
+    
+    def get_relationships(self, username: str) -> Tuple[Set[str], Set[str]]:
+        followers, following = self.get_relationship_ids(username)
+        return followers.usernames(), following.usernames()
+    
+    @timed("profile")
+    def get_profile(self, username: str) -> Dict:
+        """Fetch public profile details of one user through the rate limiter"""
+        try:
+            user = self._call(self.client.user_info_by_username, username)
+        except UserNotFound:
+            self.resolver.forget(username)
+            raise
+        self.resolver.remember(user.username, user.pk)
+        profile = {
+            "username": user.username,
+            "pk": int(user.pk),
+            "full_name": user.full_name or "",
+            "follower_count": user.follower_count,
+            "following_count": user.following_count,
+            "media_count": user.media_count,
+            "is_private": bool(user.is_private),
+            "is_verified": bool(user.is_verified),
+            "last_post": None
+        }
+        if ENRICH_LAST_POST and user.media_count:
             try:
-                user_id = self.client.user_id_from_username(username)
-                following_data = self.client.user_following(user_id)
-                
-                # Используем асинхронную обработку
-                following = asyncio.run(self._process_users_batch(following_data))
-                return following
-                
-            except ClientError as e:
-                if "rate limit" in str(e).lower():
-                    if not self._handle_rate_limit(retry_count):
-                        break
-                    retry_count += 1
-                    continue
-                self.notify(f"Client error: {str(e)}")
-                break
-            except Exception as e:
-                self.notify(f"Error fetching following: {str(e)}")
-                break
-        
-        return following 
\ No newline at end of file
+                medias = self._call(self.client.user_medias_v1, user.pk, 1)
+            except ClientError:
+                # Posts of a private account are hidden until the follow request is accepted
+                medias = []
+            if medias:
+                profile["last_post"] = medias[0].taken_at.isoformat(timespec="seconds")
+        return profile
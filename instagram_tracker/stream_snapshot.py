@@ -0,0 +1,203 @@
+import gzip
+import heapq
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from .user_ids import UserIdSet
+from config import SNAPSHOT_RUN_SIZE
+
+EXTENSION = ".ndjson.gz"
+FORMAT_NAME = "instagram-tracker-ndjson"
+FOLLOWERS = "followers"
+FOLLOWING = "following"
+
+def is_stream_snapshot(path: str) -> bool:
+    return path.endswith(EXTENSION)
+
+class SnapshotWriter:
+    """Пишет снимок постранично в gzip NDJSON, отсортированный по pk.
+    Страницы копятся в памяти не больше run_size записей, затем сортируются и сбрасываются
+    во временные прогоны; при закрытии прогоны сливаются в итоговый файл без загрузки целиком"""
+
+    def __init__(self, path: str, username: str, timestamp: datetime,
+                 reconciled_at: Optional[datetime] = None, run_size: int = SNAPSHOT_RUN_SIZE):
+        self.path = path
+        self.header = {"format": FORMAT_NAME, "version": 1, "username": username,
+                       "timestamp": timestamp.strftime("%d_%m_%Y_%H_%M")}
+        if reconciled_at is not None:
+            self.header["quick"] = True
+            self.header["reconciled_at"] = reconciled_at.strftime("%d_%m_%Y_%H_%M")
+        self.run_size = run_size
+        self.counts = {FOLLOWERS: 0, FOLLOWING: 0}
+        self._buffers: Dict[str, List[Tuple[int, str]]] = {FOLLOWERS: [], FOLLOWING: []}
+        self._runs: Dict[str, List[str]] = {FOLLOWERS: [], FOLLOWING: []}
+        self._tmp_dir = tempfile.mkdtemp(prefix=".runs_", dir=os.path.dirname(path) or ".")
+
+    def __enter__(self) -> "SnapshotWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def add(self, relation: str, users: Iterable[Tuple]):
+        """Добавляет пользователей: пары (pk, username) или записи, начинающиеся с них"""
+        buffer = self._buffers[relation]
+        buffer.extend((int(user[0]), user[1]) for user in users)
+        if len(buffer) >= self.run_size:
+            self._spill(relation)
+
+    def _spill(self, relation: str):
+        buffer = self._buffers[relation]
+        buffer.sort()
+        run_path = os.path.join(self._tmp_dir, f"{relation}_{len(self._runs[relation])}.tsv")
+        with open(run_path, 'w', encoding='utf-8') as f:
+            f.writelines(f"{pk}\t{username}\n" for pk, username in buffer)
+        self._runs[relation].append(run_path)
+        buffer.clear()
+
+    @staticmethod
+    def _read_run(run_path: str) -> Iterator[Tuple[int, str]]:
+        with open(run_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                pk, username = line.rstrip("\n").split("\t", 1)
+                yield int(pk), username
+
+    def _merged(self, relation: str) -> Iterator[Tuple[int, str]]:
+        """Слияние прогонов и буфера; повторы одного pk со смежных страниц отбрасываются"""
+        buffer = self._buffers[relation]
+        buffer.sort()
+        sources = [self._read_run(run_path) for run_path in self._runs[relation]] + [iter(buffer)]
+        last_pk = None
+        for pk, username in heapq.merge(*sources):
+            if pk != last_pk:
+                last_pk = pk
+                yield pk, username
+
+    def close(self) -> str:
+        """Сливает прогоны в итоговый файл (атомарно) и удаляет временные файлы"""
+        tmp_path = self.path + ".tmp"
+        try:
+            with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+                f.write(json.dumps(self.header, ensure_ascii=False) + "\n")
+                for relation in (FOLLOWERS, FOLLOWING):
+                    f.write(json.dumps({"section": relation}) + "\n")
+                    count = 0
+                    for pk, username in self._merged(relation):
+                        f.write(f"[{pk},{json.dumps(username, ensure_ascii=False)}]\n")
+                        count += 1
+                    self.counts[relation] = count
+                f.write(json.dumps({"stats": {"followers_count": self.counts[FOLLOWERS],
+                                              "following_count": self.counts[FOLLOWING]}}) + "\n")
+            os.replace(tmp_path, self.path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+        return self.path
+
+    def abort(self):
+        """Отбрасывает незаконченный снимок"""
+        shutil.rmtree(self._tmp_dir, ignore_errors=True)
+
+class SnapshotReader:
+    """Ленивое чтение снимка gzip NDJSON: пользователи раздела идут по возрастанию pk,
+    в памяти держится только текущая строка"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            self.header = json.loads(f.readline())
+        if self.header.get("format") != FORMAT_NAME:
+            raise ValueError(f"{path} не является снимком {FORMAT_NAME}")
+
+    def iter_users(self, relation: str) -> Iterator[Tuple[int, str]]:
+        """Пары (pk, username) раздела followers или following"""
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            f.readline()
+            inside = False
+            for line in f:
+                if line.startswith("["):
+                    if inside:
+                        pk, username = json.loads(line)
+                        yield pk, username
+                elif inside:
+                    return
+                else:
+                    inside = json.loads(line).get("section") == relation
+
+    def to_data(self) -> Dict:
+        """Загружает снимок целиком в том же виде, что и InstagramDataManager.load_data"""
+        names = {}
+        follower_ids = UserIdSet.from_pairs(self.iter_users(FOLLOWERS), names)
+        following_ids = UserIdSet.from_pairs(self.iter_users(FOLLOWING), names)
+        data = dict(self.header)
+        del data["format"], data["version"]
+        data.update({
+            "followers": follower_ids.usernames(),
+            "following": following_ids.usernames(),
+            "follower_ids": follower_ids,
+            "following_ids": following_ids,
+            "stats": {
+                "followers_count": len(follower_ids),
+                "following_count": len(following_ids)
+            }
+        })
+        return data
+
+def diff_streams(old: Iterator[Tuple[int, str]],
+                 new: Iterator[Tuple[int, str]]) -> Tuple[List[str], List[str], List[Tuple[int, str, str]]]:
+    """Слиянием двух потоков, отсортированных по pk, находит добавленных, удаленных
+    и сменивших имя пользователей"""
+    added, removed, renamed = [], [], []
+    end = (None, None)
+    old_pk, old_name = next(old, end)
+    new_pk, new_name = next(new, end)
+    while old_pk is not None or new_pk is not None:
+        if new_pk is None or (old_pk is not None and old_pk < new_pk):
+            removed.append(old_name)
+            old_pk, old_name = next(old, end)
+        elif old_pk is None or new_pk < old_pk:
+            added.append(new_name)
+            new_pk, new_name = next(new, end)
+        else:
+            if old_name != new_name:
+                renamed.append((old_pk, old_name, new_name))
+            old_pk, old_name = next(old, end)
+            new_pk, new_name = next(new, end)
+    return added, removed, renamed
+
+def compare_snapshot_files(old_path: str, new_path: str) -> Dict:
+    """Сравнивает два снимка потоково, не загружая ни один из них в память"""
+    old, new = SnapshotReader(old_path), SnapshotReader(new_path)
+    result = {}
+    renamed = {}
+    for relation, added_key, removed_key in ((FOLLOWERS, "new_followers", "unfollowers"),
+                                             (FOLLOWING, "new_following", "unfollowed")):
+        added, removed, relation_renamed = diff_streams(old.iter_users(relation), new.iter_users(relation))
+        result[added_key] = sorted(added)
+        result[removed_key] = sorted(removed)
+        for pk, old_username, new_username in relation_renamed:
+            renamed[pk] = {"pk": pk, "old_username": old_username, "new_username": new_username}
+    result["renamed"] = sorted(renamed.values(), key=lambda entry: entry["new_username"])
+    result["timestamp"] = new.header["timestamp"]
+    result["compared_with"] = old.header["timestamp"]
+    return result
+
+def read_non_followers(path: str) -> List[str]:
+    """Подписки, которые не подписаны в ответ, одним слиянием двух разделов снимка"""
+    reader = SnapshotReader(path)
+    followers = reader.iter_users(FOLLOWERS)
+    follower_pk = next(followers, (None, None))[0]
+    result = []
+    for pk, username in reader.iter_users(FOLLOWING):
+        while follower_pk is not None and follower_pk < pk:
+            follower_pk = next(followers, (None, None))[0]
+        if follower_pk != pk:
+            result.append(username)
+    return sorted(result)
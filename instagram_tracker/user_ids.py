@@ -0,0 +1,105 @@
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy необязателен, без него работает слияние на чистом Python
+    np = None
+
+def _merge(a: array, b: array, keep_common: bool) -> array:
+    """Слияние двух отсортированных массивов: общие элементы или элементы только из a"""
+    if np is not None:
+        left = np.frombuffer(a, dtype=np.int64)
+        right = np.frombuffer(b, dtype=np.int64)
+        if keep_common:
+            result = np.intersect1d(left, right, assume_unique=True)
+        else:
+            result = np.setdiff1d(left, right, assume_unique=True)
+        return array('q', result.astype(np.int64).tobytes())
+
+    result = array('q')
+    i = j = 0
+    len_a, len_b = len(a), len(b)
+    while i < len_a and j < len_b:
+        x, y = a[i], b[j]
+        if x == y:
+            if keep_common:
+                result.append(x)
+            i += 1
+            j += 1
+        elif x < y:
+            if not keep_common:
+                result.append(x)
+            i += 1
+        else:
+            j += 1
+    if not keep_common:
+        result.extend(a[i:])
+    return result
+
+class UserIdSet:
+    """Множество пользователей по стабильному pk: отсортированный array('q') и таблица pk -> username"""
+
+    __slots__ = ("pks", "names")
+
+    def __init__(self, pks: Optional[array] = None, names: Optional[Dict[int, str]] = None):
+        self.pks = pks if pks is not None else array('q')
+        self.names = names if names is not None else {}
+
+    @classmethod
+    def from_pairs(cls, pairs: Iterable[Tuple], names: Optional[Dict[int, str]] = None) -> "UserIdSet":
+        """Строит множество из пар (pk, username) или записей, начинающихся с них;
+        таблицу имен можно разделить между множествами"""
+        names = names if names is not None else {}
+        pks = set()
+        for user in pairs:
+            pk = int(user[0])
+            pks.add(pk)
+            names[pk] = user[1]
+        return cls(array('q', sorted(pks)), names)
+
+    def __len__(self) -> int:
+        return len(self.pks)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.pks)
+
+    def __contains__(self, pk: int) -> bool:
+        index = bisect_left(self.pks, pk)
+        return index < len(self.pks) and self.pks[index] == pk
+
+    def username(self, pk: int) -> str:
+        return self.names[pk]
+
+    def usernames(self) -> Set[str]:
+        """Имена всех пользователей множества"""
+        return {self.names[pk] for pk in self.pks}
+
+    def pairs(self) -> List[Tuple[int, str]]:
+        """Пары (pk, username) в порядке pk"""
+        return [(pk, self.names[pk]) for pk in self.pks]
+
+    def difference(self, other: "UserIdSet") -> "UserIdSet":
+        """Пользователи, которых нет в other"""
+        return UserIdSet(_merge(self.pks, other.pks, keep_common=False), self.names)
+
+    def intersection(self, other: "UserIdSet") -> "UserIdSet":
+        """Пользователи, которые есть в обоих множествах"""
+        return UserIdSet(_merge(self.pks, other.pks, keep_common=True), self.names)
+
+    def __sub__(self, other: "UserIdSet") -> "UserIdSet":
+        return self.difference(other)
+
+    def __and__(self, other: "UserIdSet") -> "UserIdSet":
+        return self.intersection(other)
+
+    def renamed(self, newer: "UserIdSet") -> List[Tuple[int, str, str]]:
+        """Пользователи из обоих множеств, сменившие имя: (pk, старое имя, новое имя)"""
+        return [(pk, self.names[pk], newer.names[pk])
+                for pk in _merge(self.pks, newer.pks, keep_common=True)
+                if self.names[pk] != newer.names[pk]]
+
+def as_usernames(users) -> Set[str]:
+    """Имена пользователей множества UserIdSet или обычного множества имен"""
+    return users.usernames() if isinstance(users, UserIdSet) else set(users)
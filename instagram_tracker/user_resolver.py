@@ -0,0 +1,111 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+from config import USER_ID_DB, USER_ID_TTL, USER_ID_VERIFY_AFTER
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_ids (
+    username TEXT PRIMARY KEY,
+    pk INTEGER NOT NULL,
+    resolved_at REAL NOT NULL
+);
+"""
+
+class UserIdResolver:
+    """Определяет pk по имени пользователя: сначала память, затем таблица на диске, и только потом запрос.
+    Одновременные запросы одного имени из разных потоков сводятся к одному запросу.
+    Имя может перейти к другому аккаунту, поэтому давно не проверенный pk сверяется с его текущим именем"""
+
+    def __init__(self, path: Optional[str] = USER_ID_DB, ttl: float = USER_ID_TTL,
+                 verify_after: float = USER_ID_VERIFY_AFTER, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.ttl = ttl
+        self.verify_after = verify_after
+        self._clock = clock
+        # Имя -> (pk, время последней проверки)
+        self._memo: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._pending: Dict[str, threading.Lock] = {}
+        self._conn = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+
+    def _load(self, username: str) -> Optional[Tuple[int, float]]:
+        if self._conn is None:
+            return None
+        with self._lock:
+            row = self._conn.execute("SELECT pk, resolved_at FROM user_ids WHERE username = ? AND resolved_at > ?",
+                                     (username, self._clock() - self.ttl)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def remember(self, username: str, pk: int):
+        """Запоминает известное соответствие, например из загруженного профиля"""
+        pk, now = int(pk), self._clock()
+        with self._lock:
+            self._memo[username] = (pk, now)
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("INSERT OR REPLACE INTO user_ids VALUES (?, ?, ?)", (username, pk, now))
+
+    def forget(self, username: str):
+        """Удаляет соответствие, например если имя перешло к другому аккаунту"""
+        with self._lock:
+            self._memo.pop(username, None)
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM user_ids WHERE username = ?", (username,))
+
+    def _cached(self, username: str, verify: Optional[Callable[[int], Optional[str]]]) -> Optional[int]:
+        """pk из памяти или с диска; если он давно не проверялся, verify возвращает текущее имя аккаунта.
+        Если имя сменилось или аккаунта нет, соответствие забывается; если verify упал, pk остается"""
+        entry = self._memo.get(username) or self._load(username)
+        if entry is None:
+            return None
+        pk, checked_at = entry
+        if verify is not None and self._clock() - checked_at >= self.verify_after:
+            try:
+                current = verify(pk)
+            except Exception:
+                # Проверить не удалось (сеть, лимиты): pk используется как есть,
+                # а на диске остается старое время, и следующий запуск проверит его снова
+                self._memo[username] = (pk, self._clock())
+                return pk
+            if current != username:
+                self.forget(username)
+                if current:
+                    self.remember(current, pk)
+                return None
+            self.remember(username, pk)
+        else:
+            self._memo[username] = entry
+        return pk
+
+    def resolve(self, username: str, lookup: Callable[[str], int],
+                verify: Optional[Callable[[int], Optional[str]]] = None) -> int:
+        """pk пользователя; lookup вызывается, только если pk нет ни в памяти, ни на диске
+        или сохраненный pk больше не принадлежит этому имени"""
+        entry = self._memo.get(username)
+        if entry is not None and (verify is None or self._clock() - entry[1] < self.verify_after):
+            return entry[0]
+        with self._lock:
+            pending = self._pending.setdefault(username, threading.Lock())
+        try:
+            with pending:
+                pk = self._cached(username, verify)
+                if pk is None:
+                    pk = int(lookup(username))
+                    self.remember(username, pk)
+        finally:
+            with self._lock:
+                self._pending.pop(username, None)
+        return pk
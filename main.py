@@ -1,14 +1,43 @@
 import os
 import sys
-import asyncio
 import argparse
-from datetime import datetime
-from dotenv import load_dotenv
-from instagram_tracker.strategies import InstagrapiStrategy
-from instagram_tracker.observers import ConsoleProgressObserver
+import atexit
+import signal
+from instagram_tracker.observers import ConsoleProgressObserver, ThrottledProgressObserver, MetricsObserver
 from instagram_tracker.analyzer import InstagramAnalyzer
-from instagram_tracker.data_manager import InstagramDataManager
-from config import INSTAGRAM_USERNAME, INSTAGRAM_PASSWORD
+from instagram_tracker.interfaces import fetch_relationships
+from instagram_tracker.user_ids import as_usernames
+from instagram_tracker.data_manager import InstagramDataManager, JSON_FORMAT, NDJSON_FORMAT
+from instagram_tracker.stream_snapshot import read_non_followers
+from instagram_tracker.sqlite_store import SQLiteSnapshotStore
+from instagram_tracker.replay import ReplayStrategy, SyntheticStrategy
+from instagram_tracker.batch import BatchRunner, parse_credentials, read_targets
+from instagram_tracker.daemon import TrackerDaemon, load_daemon_config
+from instagram_tracker.quick_delta import QuickDeltaFetcher
+from instagram_tracker.profile_cache import ProfileCache
+from instagram_tracker.user_resolver import UserIdResolver
+from instagram_tracker.overlap import OverlapAnalyzer
+from config import SNAPSHOT_DB, OVERLAP_LIST_LIMIT, load_env
+
+def create_instagrapi_strategy(args, resolver=None):
+    """Создает стратегию instagrapi; импорт отложен, чтобы офлайн-режимы работали без нее"""
+    from instagram_tracker.strategies import InstagrapiStrategy
+    from instagram_tracker.session import SessionStore
+    session_store = None if args.no_session else SessionStore()
+    return InstagrapiStrategy(streaming=args.stream, session_store=session_store, resolver=resolver)
+
+def load_credentials() -> list:
+    """Читает логины из .env, нужны только для входа в Instagram"""
+    load_env()
+    return parse_credentials(os.environ)
+
+def default_username() -> str:
+    """Аккаунт по умолчанию из .env для офлайн-режимов; без python-dotenv берется из окружения"""
+    try:
+        load_env()
+    except ImportError:
+        pass
+    return os.getenv('INSTAGRAM_USERNAME')
 
 def print_comparison_results(comparison_data: dict):
     """Выводит результаты сравнения"""
@@ -35,8 +64,209 @@ def print_comparison_results(comparison_data: dict):
         for username in comparison_data["unfollowed"]:
             print(f"- {username}")
     
+    if comparison_data.get("renamed"):
+        print("\nСменили имя:")
+        for entry in comparison_data["renamed"]:
+            print(f"~ {entry['old_username']} -> {entry['new_username']}")
+    
     print(f"\nВремя сравнения: {comparison_data['timestamp']}")
 
+def print_profiles(profiles: list):
+    """Выводит профили невзаимных подписок"""
+    print("\n=== Профили ===")
+    print(f"{'Аккаунт':<30} {'Подписчики':>11} {'Подписки':>9} {'Посты':>6}  {'Закрыт':<6} {'Галочка':<7} Последний пост")
+    for profile in profiles:
+        if "error" in profile:
+            print(f"{profile['username']:<30} ошибка: {profile['error']}")
+            continue
+        print(f"{profile['username']:<30} {profile['follower_count']:>11} {profile['following_count']:>9} "
+              f"{profile['media_count']:>6}  {'да' if profile['is_private'] else 'нет':<6} "
+              f"{'да' if profile['is_verified'] else 'нет':<7} {profile['last_post'] or '-'}")
+
+def print_history(target_username: str, history: list):
+    """Выводит изменения между последними снимками"""
+    print(f"\n=== История изменений {target_username} ===")
+    if not history:
+        print("Недостаточно сохраненных снимков (нужно хотя бы два)")
+        return
+    
+    for entry in history:
+        print(f"\n{entry['compared_with']} -> {entry['timestamp']}")
+        for username in entry["new_followers"]:
+            print(f"  + подписался: {username}")
+        for username in entry["unfollowers"]:
+            print(f"  - отписался: {username}")
+        for username in entry["new_following"]:
+            print(f"  + новая подписка: {username}")
+        for username in entry["unfollowed"]:
+            print(f"  - подписка отменена: {username}")
+        for renamed in entry.get("renamed", []):
+            print(f"  ~ сменил имя: {renamed['old_username']} -> {renamed['new_username']}")
+        if not any(entry.get(key) for key in ("new_followers", "unfollowers", "new_following", "unfollowed", "renamed")):
+            print("  без изменений")
+
+def print_user_list(title: str, usernames: list, limit: int = OVERLAP_LIST_LIMIT):
+    """Выводит заголовок с числом пользователей и первые limit имен"""
+    print(f"\n{title}: {len(usernames)}")
+    for username in usernames[:limit]:
+        print(f"  {username}")
+    if len(usernames) > limit:
+        print(f"  ... и еще {len(usernames) - limit}")
+
+def print_overlap(report: dict):
+    """Выводит матрицу пересечения аудиторий и списки общих и чужих пользователей"""
+    accounts = report["accounts"]
+    print("\n=== Пересечение аудиторий ===")
+    for username in accounts:
+        print(f"{username}: снимок от {report['timestamps'][username]}")
+    
+    # Row i, column j: how many of the users of account i are also in account j
+    width = max(12, *(len(username) + 1 for username in accounts))
+    print("\n" + " " * width + "".join(f"{index + 1:>10}" for index in range(len(accounts))))
+    for index, (username, row) in enumerate(zip(accounts, report["matrix"])):
+        own = row[index]
+        cells = "".join(f"{count:>10}" if column == index else
+                        f"{(count / own * 100 if own else 0):>9.1f}%"
+                        for column, count in enumerate(row))
+        print(f"{index + 1:>2}. {username:<{width - 4}}{cells}")
+    print("\nНа диагонали — число подписчиков, в остальных ячейках — доля подписчиков строки, подписанных и на столбец")
+    
+    print_user_list("Общие для всех аккаунтов", report["shared"])
+    ours = ", ".join(report["ours"])
+    for username, usernames in report["not_ours"].items():
+        print_user_list(f"Есть у {username}, но нет у {ours}", usernames)
+
+def print_batch_summary(results: list):
+    """Выводит итоги пакетной обработки"""
+    print("\n=== Итоги пакетной обработки ===")
+    print(f"{'Аккаунт':<30} {'Подписчики':>11} {'Подписки':>9} {'Невзаимные':>11} {'Изменения':>10} {'Сек':>6}")
+    for result in results:
+        if result["error"]:
+            print(f"{result['username']:<30} ошибка: {result['error']}")
+            continue
+        changes = sum(result["changes"].values()) if "changes" in result else "-"
+        print(f"{result['username']:<30} {result['followers_count']:>11} {result['following_count']:>9} "
+              f"{result['non_followers_count']:>11} {changes:>10} {result['seconds']:>6}")
+    failed = sum(1 for result in results if result["error"])
+    print(f"\nОбработано: {len(results) - failed}, с ошибками: {failed}")
+
+def run_batch(args, data_manager: InstagramDataManager, credentials: list, metrics=None):
+    """Обрабатывает список аккаунтов параллельно на нескольких логинах, по одному потоку на логин"""
+    targets = read_targets(args.batch)
+    if not targets:
+        print(f"Ошибка: в файле {args.batch} нет аккаунтов")
+        sys.exit(1)
+    
+    observer = ThrottledProgressObserver(ConsoleProgressObserver())
+    strategies = []
+    if args.synthetic is not None:
+        strategies.append(SyntheticStrategy(args.synthetic))
+    else:
+        # One resolver for all logins, so each target's pk is looked up once per batch
+        resolver = UserIdResolver()
+        for login, password in credentials:
+            strategy = create_instagrapi_strategy(args, resolver)
+            # Login messages (and 2FA prompts) are shown, per-page progress of parallel logins is not
+            strategy.attach(observer)
+            if strategy.login(login, password):
+                strategies.append(strategy)
+            else:
+                print(f"Не удалось войти как {login}, логин пропущен")
+            strategy.detach(observer)
+    if not strategies:
+        print("Failed to login. Please check your credentials.")
+        sys.exit(1)
+    
+    runner = BatchRunner(strategies, data_manager, quick=args.quick)
+    runner.attach(observer)
+    if metrics:
+        for subject in strategies + [runner]:
+            subject.attach(metrics)
+    print_batch_summary(runner.run(targets))
+
+def run_daemon(args, data_manager: InstagramDataManager, credentials: list, metrics=None):
+    """Опрашивает аккаунты из конфигурации по расписанию, не завершая процесс"""
+    try:
+        daemon_config = load_daemon_config(args.daemon)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Ошибка: не удалось прочитать конфигурацию {args.daemon}: {e}")
+        sys.exit(1)
+    if not daemon_config["accounts"]:
+        print(f"Ошибка: в конфигурации {args.daemon} нет аккаунтов")
+        sys.exit(1)
+    
+    observer = ThrottledProgressObserver(ConsoleProgressObserver())
+    relogin = None
+    if args.synthetic is not None:
+        strategy = SyntheticStrategy(args.synthetic)
+    else:
+        login, password = credentials[0]
+        strategy = create_instagrapi_strategy(args)
+        strategy.attach(observer)
+        if not strategy.login(login, password):
+            print("Failed to login. Please check your credentials.")
+            sys.exit(1)
+        strategy.detach(observer)
+        # The saved session passed its check when the failures started, so do not trust it again
+        relogin = lambda: strategy.login(login, password, reuse_session=False)
+    
+    runner = BatchRunner([strategy], data_manager, quick=args.quick)
+    daemon = TrackerDaemon(strategy, runner, daemon_config["accounts"],
+                           jitter=daemon_config["jitter"], relogin=relogin)
+    daemon.attach(observer)
+    if metrics:
+        for subject in (strategy, runner, daemon):
+            subject.attach(metrics)
+    # Finish the current poll and exit cleanly on Ctrl+C or a service stop
+    signal.signal(signal.SIGINT, lambda *_: daemon.stop())
+    signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
+    daemon.run()
+
+def resolve_snapshot(data_manager: InstagramDataManager, ref: str, target_username: str) -> str:
+    """Путь к снимку по пути, ссылке на базу или по словам latest и previous"""
+    if ref in ("latest", "previous"):
+        if not target_username:
+            print(f"Ошибка: для {ref} укажите имя пользователя")
+            sys.exit(1)
+        resolved = data_manager.get_snapshot_ref(target_username, 0 if ref == "latest" else 1)
+    else:
+        resolved = ref if data_manager.exists(ref) else None
+    if resolved is None:
+        print(f"Ошибка: снимок {ref} не найден")
+        sys.exit(1)
+    return resolved
+
+def run_diff(args, data_manager: InstagramDataManager, target_username: str):
+    """Сравнивает два сохраненных снимка без входа в Instagram"""
+    if len(args.diff) > 2:
+        print("Ошибка: --diff принимает не больше двух снимков")
+        sys.exit(1)
+    # Missing snapshots default to the two latest ones of the account
+    old_ref, new_ref = args.diff + ["previous", "latest"][len(args.diff):]
+    old_ref = resolve_snapshot(data_manager, old_ref, target_username)
+    new_ref = resolve_snapshot(data_manager, new_ref, target_username)
+    
+    comparison = data_manager.compare_files(old_ref, new_ref)
+    print_comparison_results(comparison)
+    if args.save:
+        username = target_username or data_manager.load_data(new_ref)['username']
+        comparison_file = data_manager.save_comparison(username, comparison)
+        print(f"\nРезультаты сравнения сохранены в файл: {comparison_file}")
+
+def run_overlap(args, data_manager: InstagramDataManager, metrics=None):
+    """Сравнивает аудитории нескольких аккаунтов по их последним снимкам без входа в Instagram"""
+    analyzer = OverlapAnalyzer(data_manager)
+    analyzer.attach(ThrottledProgressObserver(ConsoleProgressObserver()))
+    if metrics:
+        analyzer.attach(metrics)
+    missing = analyzer.load(args.overlap)
+    for username in missing:
+        print(f"Нет сохраненных снимков для {username}")
+    if len(analyzer.accounts) < 2:
+        print("Ошибка: для сравнения нужны снимки хотя бы двух аккаунтов")
+        sys.exit(1)
+    print_overlap(analyzer.report())
+
 def main():
     parser = argparse.ArgumentParser(
         description='Анализ подписчиков и подписок в Instagram',
@@ -47,58 +277,190 @@ python main.py              - проверка своего аккаунта
 python main.py USERNAME     - проверка указанного аккаунта
 python main.py USERNAME --save           - сохранить результаты в JSON
 python main.py USERNAME --compare FILE   - сравнить с данными из файла
+python main.py USERNAME --compare latest - сравнить с последним сохраненным снимком
+python main.py USERNAME --history [N]    - изменения за последние N снимков (без входа)
+python main.py USERNAME --stream         - постраничная загрузка с продолжением после сбоя
+python main.py USERNAME --save --quick   - загрузить только новые подписки, остальное взять из снимка
+python main.py USERNAME --enrich         - показать профили тех, кто не подписан в ответ
+python main.py --no-session              - выполнить полный вход, не используя сохраненную сессию
+python main.py USERNAME --save --db      - сохранить снимок в базу SQLite вместо JSON
+python main.py USERNAME --save --format ndjson - сохранять снимок постранично в сжатый NDJSON
+python main.py --import-json [DIR]       - перенести JSON снимки из каталога в базу SQLite
+python main.py USERNAME --replay [FILE]  - взять данные из сохраненного снимка вместо Instagram
+python main.py USERNAME --diff [OLD [NEW]] - сравнить два сохраненных снимка (без входа)
+python main.py demo --synthetic 100000   - сгенерировать аккаунт на 100000 подписчиков (без входа)
+python main.py --batch FILE              - обработать аккаунты из файла (по одному в строке)
+python main.py --daemon CONFIG           - опрашивать аккаунты по расписанию из JSON конфигурации
+python main.py USERNAME --metrics FILE   - записать время этапов и счетчики запросов (JSON или .prom)
+python main.py --overlap A B [C ...]     - пересечение аудиторий аккаунтов по последним снимкам (без входа)
 
 Формат файлов:
-- Данные: username_DD_MM_YYYY_HH_MM.json
+- Данные: username_DD_MM_YYYY_HH_MM.json (или .ndjson.gz с --format ndjson)
 - Сравнение: username_comparison_DD_MM_YYYY_HH_MM.json
 
+Без входа в Instagram (и без файла .env) работают --history, --diff, --overlap,
+--replay, --synthetic и --import-json.
+
 Требования:
 - Файл .env с учетными данными Instagram
+  (INSTAGRAM_USERNAME_2, INSTAGRAM_PASSWORD_2, ... - дополнительные логины для --batch)
 - VPN (если Instagram недоступен в регионе)
 '''
     )
     parser.add_argument('username', nargs='?', help='Имя пользователя Instagram')
     parser.add_argument('--save', action='store_true', help='Сохранить в JSON')
-    parser.add_argument('--compare', help='Сравнить с файлом')
+    parser.add_argument('--compare', help='Сравнить с файлом или с последним снимком (latest)')
+    parser.add_argument('--history', nargs='?', type=int, const=10, metavar='N',
+                        help='Показать изменения за последние N снимков')
+    parser.add_argument('--stream', action='store_true', help='Загружать постранично с сохранением позиции')
+    parser.add_argument('--quick', action='store_true',
+                        help='Загружать только новые подписки, полная сверка раз в FULL_RECONCILE_INTERVAL')
+    parser.add_argument('--enrich', action='store_true',
+                        help='Загрузить профили невзаимных подписок (с кэшем на диске)')
+    parser.add_argument('--no-session', action='store_true', help='Не использовать сохраненную сессию')
+    parser.add_argument('--db', nargs='?', const=SNAPSHOT_DB, help='Хранить снимки в базе SQLite')
+    parser.add_argument('--format', choices=[JSON_FORMAT, NDJSON_FORMAT], default=JSON_FORMAT,
+                        help='Формат файлов снимков: json или сжатый построчный ndjson')
+    parser.add_argument('--import-json', nargs='?', const='data', metavar='DIR',
+                        help='Импортировать JSON снимки в базу SQLite')
+    parser.add_argument('--replay', nargs='?', const='latest', metavar='FILE',
+                        help='Использовать сохраненный снимок вместо Instagram (по умолчанию последний)')
+    parser.add_argument('--diff', nargs='*', metavar='SNAPSHOT',
+                        help='Сравнить два сохраненных снимка (файлы, ссылки на базу, latest или previous)')
+    parser.add_argument('--overlap', nargs='+', metavar='ACCOUNT',
+                        help='Сравнить аудитории аккаунтов по последним снимкам (первый аккаунт - свой)')
+    parser.add_argument('--synthetic', type=int, metavar='SIZE',
+                        help='Использовать синтетический аккаунт с SIZE подписчиками вместо Instagram')
+    parser.add_argument('--batch', metavar='FILE', help='Обработать аккаунты из файла')
+    parser.add_argument('--daemon', metavar='CONFIG', help='Опрашивать аккаунты по расписанию из файла')
+    parser.add_argument('--metrics', metavar='FILE',
+                        help='Записывать метрики в файл (JSON, или формат Prometheus для .prom)')
     args = parser.parse_args()
 
-    # Load environment variables
-    load_dotenv()
+    # Import does not need Instagram at all
+    if args.import_json:
+        store = SQLiteSnapshotStore(args.db or SNAPSHOT_DB)
+        snapshot_ids = store.import_directory(args.import_json)
+        print(f"Импортировано снимков: {len(snapshot_ids)} в {store.path}")
+        return
+
+    # Create data manager
+    store = SQLiteSnapshotStore(args.db) if args.db else None
+    data_manager = InstagramDataManager(store=store, snapshot_format=args.format)
+    metrics = None
+    if args.metrics:
+        metrics = MetricsObserver(args.metrics)
+        data_manager.attach(metrics)
+        # Written on every way out, including sys.exit after an error
+        atexit.register(metrics.flush)
+
+    # History and diffs are computed from stored snapshots only
+    if args.history is not None:
+        target_username = args.username or default_username()
+        if not target_username:
+            print("Ошибка: укажите имя пользователя")
+            sys.exit(1)
+        print_history(target_username, data_manager.get_history(target_username, args.history))
+        return
     
-    # Get credentials from environment variables
-    username = os.getenv('INSTAGRAM_USERNAME')
-    password = os.getenv('INSTAGRAM_PASSWORD')
+    if args.diff is not None:
+        run_diff(args, data_manager, args.username or default_username())
+        return
     
-    if not username or not password:
+    if args.overlap:
+        run_overlap(args, data_manager, metrics)
+        return
+
+    # Offline strategies never log in, so neither .env nor instagrapi is needed for them
+    offline = args.replay is not None or args.synthetic is not None
+    credentials = [] if offline else load_credentials()
+    
+    if not offline and not credentials:
         print("Ошибка: INSTAGRAM_USERNAME и INSTAGRAM_PASSWORD должны быть заданы в файле .env")
         sys.exit(1)
+    username, password = credentials[0] if credentials else (args.username or default_username(), None)
+    
+    if args.batch:
+        run_batch(args, data_manager, credentials, metrics)
+        return
+    
+    if args.daemon:
+        run_daemon(args, data_manager, credentials, metrics)
+        return
     
     # Get target username from command line or use the authenticated user
     target_username = args.username or username
+    if not target_username:
+        print("Ошибка: укажите имя пользователя")
+        sys.exit(1)
     
     # Create strategy and observer
-    strategy = InstagrapiStrategy()
-    observer = ConsoleProgressObserver()
+    if args.replay is not None:
+        strategy = ReplayStrategy(data_manager, None if args.replay == 'latest' else args.replay)
+    elif args.synthetic is not None:
+        strategy = SyntheticStrategy(args.synthetic)
+    else:
+        strategy = create_instagrapi_strategy(args)
+    observer = ThrottledProgressObserver(ConsoleProgressObserver())
     strategy.attach(observer)
+    if metrics:
+        strategy.attach(metrics)
     
     # Create analyzer
     analyzer = InstagramAnalyzer(strategy)
     
-    # Create data manager
-    data_manager = InstagramDataManager()
-    
     try:
+        # Pages go straight into a gzip NDJSON file instead of being collected in memory
+        streamed = (args.format == NDJSON_FORMAT and args.save and not args.quick and store is None
+                    and hasattr(strategy, 'iter_follower_records'))
+        
+        # Resolve the snapshot to compare with before this run saves a newer one
+        old_ref = None
+        if args.compare == 'latest':
+            old_ref = data_manager.get_snapshot_ref(target_username)
+            if old_ref is None:
+                print(f"Ошибка: нет сохраненных снимков для {target_username}")
+                sys.exit(1)
+        elif args.compare:
+            if not data_manager.exists(args.compare):
+                print(f"\nОшибка: Файл {args.compare} не найден")
+                sys.exit(1)
+            old_ref = args.compare
+        elif args.compare is not None:  # --compare was used without a file path
+            print("\nОшибка: Укажите путь к файлу для сравнения")
+            print("Пример: python main.py username --compare \"C:\\path\\to\\file.json\"")
+            sys.exit(1)
+        
+        # A streamed snapshot is compared file to file, so the old one is not loaded either
+        old_data = None
+        if old_ref and not streamed:
+            old_data = data_manager.load_data(old_ref)
+            if not old_data:
+                print(f"\nОшибка: Не удалось загрузить файл {old_ref}")
+                sys.exit(1)
+        
         # Login first
         if not strategy.login(username, password):
             print("Failed to login. Please check your credentials.")
             sys.exit(1)
             
-        # Get followers and following
-        followers = strategy.get_followers(target_username)
-        following = strategy.get_following(target_username)
-        
-        # Find non-followers
-        non_followers = following - followers
+        reconciled_at = None
+        if streamed:
+            # The file is written page by page, so here the lists are fetched one after the other;
+            # checkpoints are kept only with --stream
+            filename = data_manager.save_stream(
+                target_username,
+                strategy.iter_follower_records(target_username, resume=args.stream),
+                strategy.iter_following_records(target_username, resume=args.stream))
+            non_followers = read_non_followers(filename)
+        else:
+            # Get followers and following concurrently, keyed by stable user pk where the strategy knows pks
+            if args.quick:
+                previous = old_data if args.compare == 'latest' else data_manager.get_latest_snapshot(target_username)
+                followers, following, reconciled_at = QuickDeltaFetcher(strategy).fetch(target_username, previous)
+            else:
+                followers, following = fetch_relationships(strategy, target_username)
+            non_followers = as_usernames(following - followers)
         
         # Print results
         print(f"\nПользователи, которые не подписаны в ответ на {target_username}:")
@@ -106,32 +468,30 @@ python main.py USERNAME --compare FILE   - сравнить с данными и
             print(f"- {username}")
         print(f"\nВсего: {len(non_followers)} пользователей")
         
+        if args.enrich:
+            if hasattr(strategy, "get_profile"):
+                print_profiles(analyzer.enrich(non_followers, ProfileCache()))
+            else:
+                print("\nЗагрузка профилей недоступна в этом режиме")
+        
         # Save data if requested
         if args.save:
-            filename = data_manager.save_data(target_username, followers, following)
+            if not streamed:
+                filename = data_manager.save_data(target_username, followers, following, reconciled_at)
             print(f"\nДанные сохранены в файл: {filename}")
         
         # Compare with previous data if requested
-        if args.compare:
-            if not os.path.exists(args.compare):
-                print(f"\nОшибка: Файл {args.compare} не найден")
-                sys.exit(1)
-                
-            old_data = data_manager.load_data(args.compare)
-            if old_data:
-                comparison = data_manager.compare_data(old_data, followers, following)
-                print_comparison_results(comparison)
-                
-                # Save comparison results if --save is also specified
-                if args.save:
-                    comparison_file = data_manager.save_comparison(target_username, comparison)
-                    print(f"\nРезультаты сравнения сохранены в файл: {comparison_file}")
+        if old_ref:
+            if streamed:
+                comparison = data_manager.compare_files(old_ref, filename)
             else:
-                print(f"\nОшибка: Не удалось загрузить файл {args.compare}")
-        elif args.compare is not None:  # --compare was used without a file path
-            print("\nОшибка: Укажите путь к файлу для сравнения")
-            print("Пример: python main.py username --compare \"C:\\path\\to\\file.json\"")
-            sys.exit(1)
+                comparison = data_manager.compare_data(old_data, followers, following)
+            print_comparison_results(comparison)
+            
+            # Save comparison results if --save is also specified
+            if args.save:
+                comparison_file = data_manager.save_comparison(target_username, comparison)
+                print(f"\nРезультаты сравнения сохранены в файл: {comparison_file}")
     
     except Exception as e:
         print(f"Error: {str(e)}")
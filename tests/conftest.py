@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# Tests import the package and config.py the same way main.py does, from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from instagram_tracker.user_ids import UserIdSet
+
+
+@pytest.fixture
+def make_users():
+    """Build a UserIdSet from (pk, username) pairs"""
+    def make(*pairs):
+        return UserIdSet.from_pairs(pairs)
+    return make
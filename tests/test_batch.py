@@ -0,0 +1,25 @@
+from instagram_tracker.batch import BatchRunner, parse_credentials
+from instagram_tracker.data_manager import InstagramDataManager
+from instagram_tracker.replay import SyntheticStrategy
+
+
+def test_parse_credentials_numbered_pairs():
+    environ = {
+        "INSTAGRAM_USERNAME": "first", "INSTAGRAM_PASSWORD": "p,a:s s",
+        "INSTAGRAM_USERNAME_2": "second", "INSTAGRAM_PASSWORD_2": "x,y",
+        # _3 is missing, so _4 is never read
+        "INSTAGRAM_USERNAME_4": "fourth", "INSTAGRAM_PASSWORD_4": "z",
+    }
+    assert parse_credentials(environ) == [("first", "p,a:s s"), ("second", "x,y")]
+
+
+def test_parse_credentials_needs_both_values():
+    assert parse_credentials({}) == []
+    assert parse_credentials({"INSTAGRAM_USERNAME": "first"}) == []
+
+
+def test_batch_runner_tracks_every_target(tmp_path):
+    runner = BatchRunner([SyntheticStrategy(500), SyntheticStrategy(500)], InstagramDataManager(str(tmp_path)))
+    results = runner.run(["a", "b", "c"])
+    assert [result["username"] for result in results] == ["a", "b", "c"]
+    assert all(result["error"] is None and result["file"] for result in results)
@@ -0,0 +1,101 @@
+import json
+import os
+from datetime import datetime
+
+from instagram_tracker.catalog import DATA, SnapshotCatalog
+from instagram_tracker.data_manager import InstagramDataManager
+
+
+def write_snapshot(data_dir, name):
+    os.makedirs(data_dir, exist_ok=True)
+    with open(os.path.join(data_dir, name), "w", encoding="utf-8") as f:
+        json.dump({"username": "me", "followers": [], "following": []}, f)
+
+
+def test_first_save_is_indexed_once(tmp_path):
+    manager = InstagramDataManager(str(tmp_path / "data"))
+    path = manager.save_data("me", {"a"}, {"b"})
+
+    assert [info["path"] for info in manager.get_available_files("me")] == [path]
+    assert manager.get_snapshot_ref("me", 1) is None
+    with open(os.path.join(str(tmp_path / "data"), "index.json"), encoding="utf-8") as f:
+        assert len(json.load(f)["users"]["me"][DATA]) == 1
+
+
+def test_add_after_index_is_deleted(tmp_path):
+    data_dir = str(tmp_path)
+    write_snapshot(data_dir, "me_01_01_2026_10_00.json")
+    write_snapshot(data_dir, "me_02_01_2026_10_00.json")
+    catalog = SnapshotCatalog(data_dir)
+    catalog.add("me", DATA, datetime(2026, 1, 2, 10, 0), "me_02_01_2026_10_00.json")
+
+    assert [info["filename"] for info in SnapshotCatalog(data_dir).files("me")] == [
+        "me_02_01_2026_10_00.json", "me_01_01_2026_10_00.json"]
+
+
+def test_reads_stat_only_returned_entries(tmp_path, monkeypatch):
+    data_dir = str(tmp_path)
+    for day in range(1, 6):
+        name = f"me_0{day}_01_2026_10_00.json"
+        write_snapshot(data_dir, name)
+        SnapshotCatalog(data_dir).add("me", DATA, datetime(2026, 1, day, 10, 0), name)
+    catalog = SnapshotCatalog(data_dir)
+    checked = []
+    real_exists = os.path.exists
+    monkeypatch.setattr(os.path, "exists", lambda path: checked.append(path) or real_exists(path))
+
+    assert catalog.nth("me", 1)["filename"] == "me_04_01_2026_10_00.json"
+    assert len(checked) == 1
+    checked.clear()
+    assert catalog.closest("me", datetime(2026, 1, 3, 9, 0))["filename"] == "me_03_01_2026_10_00.json"
+    assert len(checked) == 2
+    checked.clear()
+    assert len(catalog.files("me", limit=2)) == 2
+    assert len(checked) == 2
+
+
+def test_deleted_file_rebuilds_and_saves_index(tmp_path):
+    data_dir = str(tmp_path)
+    for day in (1, 2):
+        name = f"me_0{day}_01_2026_10_00.json"
+        write_snapshot(data_dir, name)
+        SnapshotCatalog(data_dir).add("me", DATA, datetime(2026, 1, day, 10, 0), name)
+    os.remove(os.path.join(data_dir, "me_02_01_2026_10_00.json"))
+
+    assert SnapshotCatalog(data_dir).latest("me")["filename"] == "me_01_01_2026_10_00.json"
+    with open(os.path.join(data_dir, "index.json"), encoding="utf-8") as f:
+        assert [entry[2] for entry in json.load(f)["users"]["me"][DATA]] == ["me_01_01_2026_10_00.json"]
+
+
+def test_snapshots_of_one_minute_are_ordered_by_suffix(tmp_path):
+    data_dir = str(tmp_path)
+    names = ["me_01_01_2026_10_00.json"] + [f"me_01_01_2026_10_00_{suffix}.json" for suffix in range(2, 11)]
+    names.append("me_01_01_2026_10_00_11.ndjson.gz")
+    for name in names:
+        write_snapshot(data_dir, name)
+        SnapshotCatalog(data_dir).add("me", DATA, datetime(2026, 1, 1, 10, 0, 42), name)
+    expected = names[::-1]
+
+    assert [info["filename"] for info in SnapshotCatalog(data_dir).files("me")] == expected
+    # A rebuilt index orders the files the same way
+    SnapshotCatalog(data_dir).rebuild()
+    assert [info["filename"] for info in SnapshotCatalog(data_dir).files("me")] == expected
+
+
+def test_suffix_is_shared_between_formats(tmp_path):
+    manager = InstagramDataManager(str(tmp_path))
+    first = manager._get_filename("me", datetime(2026, 1, 1, 10, 0))
+    write_snapshot(str(tmp_path), os.path.basename(first))
+    second = manager._get_filename("me", datetime(2026, 1, 1, 10, 0), ".ndjson.gz")
+    assert os.path.basename(second) == "me_01_01_2026_10_00_2.ndjson.gz"
+
+
+def test_index_of_an_older_version_is_rebuilt(tmp_path):
+    data_dir = str(tmp_path)
+    write_snapshot(data_dir, "me_01_01_2026_10_00.json")
+    with open(os.path.join(data_dir, "index.json"), "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "users": {"me": {DATA: [["2026-01-01T10:00:17", "me_01_01_2026_10_00.json"]]}}}, f)
+
+    assert SnapshotCatalog(data_dir).latest("me")["filename"] == "me_01_01_2026_10_00.json"
+    with open(os.path.join(data_dir, "index.json"), encoding="utf-8") as f:
+        assert json.load(f)["version"] == 2
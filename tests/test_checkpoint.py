@@ -0,0 +1,24 @@
+import json
+from datetime import datetime, timedelta
+
+from instagram_tracker.checkpoint import FetchCheckpoint
+from instagram_tracker.pipeline import UserRecord
+
+
+def test_recent_checkpoint_is_resumed(tmp_path):
+    checkpoint = FetchCheckpoint(str(tmp_path), "me", "followers", max_age=3600)
+    checkpoint.save_page([UserRecord(1, "a", "", False, False)], "cursor", 1)
+    assert checkpoint.load() == ("cursor", [UserRecord(1, "a", "", False, False)])
+
+
+def test_old_checkpoint_is_discarded(tmp_path):
+    checkpoint = FetchCheckpoint(str(tmp_path), "me", "followers", max_age=3600)
+    checkpoint.save_page([UserRecord(1, "a", "", False, False)], "cursor", 1)
+    with open(checkpoint.state_path, encoding="utf-8") as f:
+        state = json.load(f)
+    state["updated"] = (datetime.now() - timedelta(hours=2)).isoformat(timespec="seconds")
+    with open(checkpoint.state_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+
+    assert checkpoint.load() == (None, [])
+    assert FetchCheckpoint(str(tmp_path), "me", "followers").load() == (None, [])
@@ -0,0 +1,45 @@
+import time
+
+from instagram_tracker.batch import BatchRunner
+from instagram_tracker.daemon import TrackerDaemon
+from instagram_tracker.data_manager import InstagramDataManager
+from instagram_tracker.interfaces import ProgressObserver
+from instagram_tracker.replay import SyntheticStrategy
+
+
+class Messages(ProgressObserver):
+    def __init__(self):
+        self.messages = []
+
+    def update_progress(self, message, percentage=None):
+        self.messages.append(message)
+
+
+def make_daemon(tmp_path, status_path, relogin=None):
+    strategy = SyntheticStrategy(200)
+    runner = BatchRunner([strategy], InstagramDataManager(str(tmp_path / "data")))
+    return TrackerDaemon(strategy, runner, [{"username": "a", "interval": 60}], jitter=0,
+                         status_path=status_path, relogin=relogin)
+
+
+def test_status_write_error_does_not_stop_polling(tmp_path):
+    # The status path is a directory, so every write fails
+    status_dir = tmp_path / "status.json"
+    status_dir.mkdir()
+    daemon = make_daemon(tmp_path, str(status_dir))
+    observer = Messages()
+    daemon.attach(observer)
+    daemon.poll(daemon._accounts["a"], time.time())
+    assert daemon._accounts["a"]["runs"] == 1
+    assert daemon._accounts["a"]["last_error"] is None
+    assert any("Не удалось записать статус" in message for message in observer.messages)
+
+
+def test_relogin_after_repeated_failures(tmp_path, monkeypatch):
+    calls = []
+    daemon = make_daemon(tmp_path, None, relogin=lambda: calls.append(1) or False)
+    monkeypatch.setattr(daemon.runner, "track", lambda strategy, target: {"error": "boom"})
+    for _ in range(3):
+        daemon.poll(daemon._accounts["a"], time.time())
+    assert calls == [1]
+    assert daemon._accounts["a"]["failures"] == 3
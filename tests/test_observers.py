@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+from instagram_tracker.batch import BatchRunner
+from instagram_tracker.data_manager import InstagramDataManager
+from instagram_tracker.interfaces import ProgressObserver
+from instagram_tracker.observers import MetricsObserver, ThrottledProgressObserver
+from instagram_tracker.pipeline import UserRecordStage
+from instagram_tracker.replay import SyntheticStrategy
+from instagram_tracker.sqlite_store import SQLiteSnapshotStore
+
+
+class Messages(ProgressObserver):
+    def __init__(self):
+        self.messages = []
+
+    def update_progress(self, message, percentage=None):
+        self.messages.append(message)
+
+
+def test_status_lines_are_never_throttled(tmp_path):
+    messages = Messages()
+    runner = BatchRunner([SyntheticStrategy(50)], InstagramDataManager(str(tmp_path / "data")))
+    runner.attach(ThrottledProgressObserver(messages, max_per_second=0.001))
+    targets = [f"user{i}" for i in range(6)]
+    runner.run(targets)
+    assert [message.split(":")[0] for message in messages.messages] == [
+        f"[{done}/6] {target}" for done, target in enumerate(targets, 1)]
+
+
+def test_page_progress_is_throttled():
+    messages = Messages()
+    strategy = SyntheticStrategy(10)
+    strategy.attach(ThrottledProgressObserver(messages, max_per_second=0.001))
+    users = [SimpleNamespace(pk=pk, username=f"u{pk}") for pk in range(1, 51)]
+    assert len(list(UserRecordStage(strategy, progress_every=1).process(users))) == 50
+    strategy.notify("Готово")
+    assert messages.messages == ["Обработано 1 пользователей.", "Готово"]
+
+
+def test_sqlite_save_counts_bytes_written(tmp_path):
+    metrics = MetricsObserver(str(tmp_path / "metrics.json"))
+    manager = InstagramDataManager(str(tmp_path / "data"), store=SQLiteSnapshotStore(str(tmp_path / "s.sqlite3")))
+    manager.attach(metrics)
+    manager.save_data("me", {"a", "b"}, {"b"})
+    assert metrics.counters["bytes_written"] > 0
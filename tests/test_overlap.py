@@ -0,0 +1,69 @@
+import pytest
+
+from instagram_tracker import overlap
+from instagram_tracker.data_manager import InstagramDataManager, NDJSON_FORMAT
+from instagram_tracker.overlap import OverlapAnalyzer, _iter_bits
+
+
+@pytest.fixture(params=["python", "numpy"])
+def overlap_backend(request, monkeypatch):
+    """Run each test with plain Python ids and bitsets and, if installed, with numpy"""
+    if request.param == "python":
+        monkeypatch.setattr(overlap, "np", None)
+    elif overlap.np is None:
+        pytest.skip("numpy is not installed")
+    return request.param
+
+
+def users(make_users, *pks):
+    return make_users(*((pk, f"user{pk}") for pk in pks))
+
+
+@pytest.fixture
+def analyzer(tmp_path, make_users, overlap_backend):
+    manager = InstagramDataManager(str(tmp_path))
+    manager.save_data("a", users(make_users, 1, 2, 3, 4), users(make_users))
+    manager.save_data("b", users(make_users, 3, 4, 5), users(make_users))
+    manager.snapshot_format = NDJSON_FORMAT
+    manager.save_data("c", users(make_users, 4, 5, 6, 700), users(make_users))
+    analyzer = OverlapAnalyzer(manager)
+    assert analyzer.load(["a", "b", "c", "missing"]) == ["missing"]
+    return analyzer
+
+
+@pytest.mark.parametrize("bits, positions", [
+    (0, []),
+    (1, [0]),
+    (0b1010_0000_0001, [0, 9, 11]),
+    (1 << 700 | 1 << 8 | 1 << 7, [7, 8, 700]),
+])
+def test_iter_bits(bits, positions):
+    assert list(_iter_bits(bits)) == positions
+
+
+def test_matrix(analyzer):
+    assert analyzer.accounts == ["a", "b", "c"]
+    assert analyzer.matrix() == [
+        [4, 2, 1],
+        [2, 3, 2],
+        [1, 2, 4],
+    ]
+
+
+def test_shared_and_exclusive(analyzer):
+    assert analyzer.shared() == ["user4"]
+    assert analyzer.shared(["a", "b"]) == ["user3", "user4"]
+    assert analyzer.exclusive("c", ["a"]) == ["user5", "user6", "user700"]
+    assert analyzer.exclusive("c", ["a", "b"]) == ["user6", "user700"]
+    assert analyzer.report()["not_ours"] == {"b": ["user5"], "c": ["user5", "user6", "user700"]}
+
+
+def test_snapshot_without_pks_matches_by_username(tmp_path, make_users, overlap_backend):
+    manager = InstagramDataManager(str(tmp_path))
+    # pk 9 was renamed to "user2": by username it is the same user as pk 2 in the other snapshot
+    manager.save_data("a", make_users((1, "user1"), (9, "user2")), make_users())
+    manager.save_data("b", {"user2", "user3"}, set())
+    analyzer = OverlapAnalyzer(manager)
+    analyzer.load(["a", "b"])
+    assert analyzer.matrix() == [[2, 1], [1, 2]]
+    assert analyzer.shared() == ["user2"]
@@ -0,0 +1,67 @@
+from instagram_tracker.analyzer import InstagramAnalyzer
+from instagram_tracker.profile_cache import ProfileCache
+from instagram_tracker.replay import SyntheticStrategy
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(tmp_path, clock, **kwargs):
+    return ProfileCache(str(tmp_path / "profiles.sqlite3"), clock=clock, **kwargs)
+
+
+def test_profiles_expire_after_ttl(tmp_path):
+    clock = Clock()
+    cache = make_cache(tmp_path, clock, ttl=100)
+    cache.put("a", {"username": "a"})
+    clock.now += 99
+    assert cache.get("a") == {"username": "a"}
+    clock.now += 1
+    assert cache.get("a") is None
+
+
+def test_least_recently_used_profile_is_evicted(tmp_path):
+    clock = Clock()
+    cache = make_cache(tmp_path, clock, max_entries=2)
+    cache.put("a", {"username": "a"})
+    clock.now += 1
+    cache.put("b", {"username": "b"})
+    clock.now += 1
+    # Reading "a" makes "b" the least recently used
+    assert cache.get_many(["a"]) == {"a": {"username": "a"}}
+    clock.now += 1
+    cache.put("c", {"username": "c"})
+    assert set(cache.get_many(["a", "b", "c"])) == {"a", "c"}
+
+
+def test_purge_expired(tmp_path):
+    clock = Clock()
+    cache = make_cache(tmp_path, clock, ttl=100)
+    cache.put("a", {"username": "a"})
+    clock.now += 50
+    cache.put("b", {"username": "b"})
+    clock.now += 60
+    assert cache.purge_expired() == 1
+    assert cache.purge_expired() == 0
+    assert cache.get("b") == {"username": "b"}
+
+
+def test_enrich_uses_and_fills_the_cache(tmp_path):
+    clock = Clock()
+    cache = make_cache(tmp_path, clock, ttl=100)
+    cache.put("user1", {"username": "user1", "cached": True})
+    cache.put("gone", {"username": "gone"})
+    clock.now += 50
+    cache.put("user1", {"username": "user1", "cached": True})
+    clock.now += 60
+
+    profiles = InstagramAnalyzer(SyntheticStrategy(10)).enrich(["user2", "user1"], cache)
+    assert [profile["username"] for profile in profiles] == ["user1", "user2"]
+    assert profiles[0]["cached"] and cache.get("user2")["pk"] == 2
+    # The expired profile of a user nobody asked for is dropped
+    assert cache._conn.execute("SELECT COUNT(*) FROM profiles WHERE username = 'gone'").fetchone()[0] == 0
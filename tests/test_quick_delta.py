@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+
+from instagram_tracker.data_manager import InstagramDataManager
+from instagram_tracker.pipeline import UserRecord
+from instagram_tracker.quick_delta import QuickDeltaFetcher, merge_head, read_new_head
+from instagram_tracker.replay import ReplayStrategy, SyntheticStrategy
+from instagram_tracker.user_ids import UserIdSet
+
+
+def record(pk, username=None):
+    return UserRecord(pk, username or f"user{pk}", "", False, False)
+
+
+def pages_of(*pages, read=None):
+    for page in pages:
+        if read is not None:
+            read.append(len(page))
+        yield [record(pk) for pk in page]
+
+
+def snapshot(strategy, timestamp="01_01_2026_10_00", **extra):
+    return dict(timestamp=timestamp, follower_ids=strategy.get_follower_ids("me"),
+                following_ids=strategy.get_following_ids("me"), **extra)
+
+
+def test_known_run_spans_pages_and_finishes_the_current_page():
+    known = UserIdSet.from_pairs((pk, f"user{pk}") for pk in range(1, 11))
+    read = []
+    # Two known users end the first page, two more start the second: the run of four is
+    # reached mid-page, the rest of that page is still kept and the third page is never read
+    head, whole = read_new_head(pages_of([20, 19, 2, 1], [4, 3, 18, 5], [7, 6], read=read), known, known_run=4)
+    assert [user.pk for user in head] == [20, 19, 2, 1, 4, 3, 18, 5]
+    assert not whole and read == [4, 4]
+
+
+def test_whole_list_is_read_when_no_run_is_reached():
+    known = UserIdSet.from_pairs([(1, "user1"), (3, "user3")])
+    read = []
+    head, whole = read_new_head(pages_of([4, 3], [2, 1], read=read), known, known_run=2)
+    assert whole and read == [2, 2]
+    assert [user.pk for user in head] == [4, 3, 2, 1]
+
+
+def test_stopping_early_closes_the_page_iterator():
+    known = UserIdSet.from_pairs([(1, "user1"), (2, "user2")])
+    read = []
+    pages = pages_of([2, 1], [9], read=read)
+    read_new_head(pages, known, known_run=2)
+    assert read == [2]
+    assert pages.gi_frame is None
+
+
+def test_merge_head_applies_renames_and_new_users():
+    previous = UserIdSet.from_pairs([(1, "a"), (2, "b")])
+    merged = merge_head([record(3, "c"), record(2, "b_new")], previous)
+    assert merged.pairs() == [(1, "a"), (2, "b_new"), (3, "c")]
+
+
+def test_needs_full(tmp_path):
+    strategy = SyntheticStrategy(100)
+    fetcher = QuickDeltaFetcher(strategy, full_interval=timedelta(hours=1))
+    now = datetime(2026, 1, 1, 10, 30)
+    previous = snapshot(strategy)
+
+    assert not fetcher.needs_full(previous, now)
+    assert fetcher.needs_full(None, now)
+    # A snapshot without pks
+    assert fetcher.needs_full({"timestamp": "01_01_2026_10_00", "followers": [], "following": []}, now)
+    # The last full fetch is older than the interval, even if the snapshot itself is recent
+    assert fetcher.needs_full(snapshot(strategy, "01_01_2026_10_20", reconciled_at="01_01_2026_09_00"), now)
+    # A strategy that cannot stream pages
+    replay = QuickDeltaFetcher(ReplayStrategy(InstagramDataManager(str(tmp_path))), full_interval=timedelta(hours=1))
+    assert replay.needs_full(previous, now)
+
+
+def test_quick_fetch_carries_reconciled_at_over():
+    strategy = SyntheticStrategy(1000, churn=0.01, page_size=50)
+    previous = snapshot(strategy, "02_01_2026_10_00", reconciled_at="01_01_2026_10_00")
+    strategy.advance()
+    fetcher = QuickDeltaFetcher(strategy, known_run=20, full_interval=timedelta(days=10 ** 5))
+
+    followers, following, reconciled_at = fetcher.fetch("me", previous)
+
+    # Based on the same full fetch as the previous quick snapshot, not on its own time
+    assert reconciled_at == datetime(2026, 1, 1, 10, 0)
+    new_followers = strategy.get_follower_ids("me") - previous["follower_ids"]
+    assert len(new_followers) and all(pk in followers for pk in new_followers)
+    assert len(followers) >= len(previous["follower_ids"])
+
+
+def test_full_fetch_returns_no_reconciled_at():
+    strategy = SyntheticStrategy(200)
+    followers, following, reconciled_at = QuickDeltaFetcher(strategy).fetch("me", None)
+    assert reconciled_at is None
+    assert followers.pairs() == strategy.get_follower_ids("me").pairs()
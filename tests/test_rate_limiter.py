@@ -0,0 +1,80 @@
+import pytest
+
+from config import MIN_RATE_FACTOR, RATE_RECOVERY_STEP
+from instagram_tracker.rate_limiter import AdaptiveRateLimiter
+
+
+class FakeClock:
+    """Time that only moves when the limiter sleeps"""
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def make_limiter(clock, **kwargs):
+    return AdaptiveRateLimiter(delay=1, burst=3, clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def test_burst_then_refill():
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+    for _ in range(3):
+        limiter.acquire()
+    assert clock.sleeps == []
+
+    limiter.acquire()
+    assert clock.sleeps == [pytest.approx(1.0)]
+    clock.now += 10
+    for _ in range(3):
+        limiter.acquire()
+    # The bucket never holds more than the burst
+    assert len(clock.sleeps) == 1
+
+
+def test_throttling_halves_the_rate_down_to_the_floor():
+    clock = FakeClock()
+    limiter = make_limiter(clock, base_backoff=4, max_backoff=8)
+    limiter.on_throttled()
+    assert limiter.rate == pytest.approx(0.5)
+    for _ in range(10):
+        limiter.on_throttled()
+    assert limiter.rate == pytest.approx(MIN_RATE_FACTOR)
+
+
+def test_backoff_pauses_every_caller():
+    clock = FakeClock()
+    limiter = make_limiter(clock, base_backoff=4, max_backoff=8)
+    delay = limiter.on_throttled()
+    assert 2 <= delay <= 4
+    limiter.acquire()
+    # The whole pause is waited out before a token is even refilled
+    assert sum(clock.sleeps) >= delay
+    assert clock.now >= 100 + delay
+
+
+def test_retry_after_is_used_as_is():
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+    assert limiter.on_throttled(retry_after=30) == 30
+    limiter.acquire()
+    assert clock.now == pytest.approx(130 + 1 / limiter.rate)
+
+
+def test_success_recovers_the_rate():
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+    limiter.on_throttled(retry_after=0)
+    assert limiter.rate == pytest.approx(0.5)
+    limiter.on_success()
+    assert limiter.rate == pytest.approx(0.5 + RATE_RECOVERY_STEP)
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.rate == pytest.approx(limiter.max_rate)
@@ -0,0 +1,41 @@
+import json
+from datetime import datetime
+
+from instagram_tracker.sqlite_store import SQLiteSnapshotStore
+from instagram_tracker.user_ids import UserIdSet
+
+
+def test_username_taken_by_another_account_keeps_old_pks(tmp_path, make_users):
+    store = SQLiteSnapshotStore(str(tmp_path / "snapshots.sqlite3"))
+    first = store.save_snapshot("me", make_users((1, "a"), (2, "b")), UserIdSet(), datetime(2026, 1, 1))
+    # Account 1 renamed itself to "z", and account 3 took the name "a"
+    store.save_snapshot("me", make_users((1, "z"), (2, "b"), (3, "a")), UserIdSet(), datetime(2026, 1, 2))
+
+    assert store.load_snapshot(first)["follower_ids"].pairs() == [(1, "a"), (2, "b")]
+    [entry] = store.history("me")
+    assert entry["new_followers"] == ["a"]
+    assert entry["unfollowers"] == []
+    assert entry["renamed"] == [{"pk": 1, "old_username": "a", "new_username": "z"}]
+
+
+def test_name_only_snapshot_followed_by_pk_snapshot(tmp_path, make_users):
+    store = SQLiteSnapshotStore(str(tmp_path / "snapshots.sqlite3"))
+    store.save_snapshot("me", {"a", "b"}, set(), datetime(2026, 1, 1))
+    store.save_snapshot("me", make_users((1, "a"), (2, "b")), UserIdSet(), datetime(2026, 1, 2))
+    [entry] = store.history("me")
+    assert not any(entry[key] for key in ("new_followers", "unfollowers", "renamed"))
+
+
+def test_import_json_keeps_pks(tmp_path):
+    path = tmp_path / "me_01_01_2026_10_00.json"
+    path.write_text(json.dumps({
+        "username": "me", "timestamp": "01_01_2026_10_00",
+        "followers": ["a", "b"], "following": ["b"],
+        "follower_pks": [1, 2], "following_pks": [2]
+    }))
+    store = SQLiteSnapshotStore(str(tmp_path / "snapshots.sqlite3"))
+    snapshot_id = store.import_json(str(path))
+    assert store.import_json(str(path)) == snapshot_id
+    data = store.load_snapshot(snapshot_id)
+    assert data["follower_ids"].pairs() == [(1, "a"), (2, "b")]
+    assert data["following_ids"].pairs() == [(2, "b")]
@@ -0,0 +1,101 @@
+import gzip
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from instagram_tracker.data_manager import InstagramDataManager
+from instagram_tracker.stream_snapshot import (FOLLOWERS, FOLLOWING, SnapshotReader, SnapshotWriter,
+                                               compare_snapshot_files, diff_streams, read_non_followers)
+
+
+def write(path, followers, following, when=datetime(2026, 1, 1, 10, 0), run_size=1000):
+    with SnapshotWriter(str(path), "me", when, run_size=run_size) as writer:
+        writer.add(FOLLOWERS, followers)
+        writer.add(FOLLOWING, following)
+    return str(path)
+
+
+def test_writer_merges_runs_and_drops_duplicate_pks(tmp_path):
+    path = tmp_path / "me.ndjson.gz"
+    with SnapshotWriter(str(path), "me", datetime(2026, 1, 1), run_size=2) as writer:
+        # Adjacent pages may repeat a user; small runs force several spills
+        writer.add(FOLLOWERS, [(5, "e"), (1, "a")])
+        writer.add(FOLLOWERS, [(3, "c"), (5, "e")])
+        writer.add(FOLLOWERS, [(2, "b")])
+        writer.add(FOLLOWING, [(4, "d", "extra record field")])
+    assert writer.counts == {FOLLOWERS: 4, FOLLOWING: 1}
+    assert os.listdir(tmp_path) == ["me.ndjson.gz"]
+
+    reader = SnapshotReader(str(path))
+    assert list(reader.iter_users(FOLLOWERS)) == [(1, "a"), (2, "b"), (3, "c"), (5, "e")]
+    assert list(reader.iter_users(FOLLOWING)) == [(4, "d")]
+
+
+def test_aborted_writer_leaves_nothing(tmp_path):
+    path = tmp_path / "me.ndjson.gz"
+    with pytest.raises(RuntimeError):
+        with SnapshotWriter(str(path), "me", datetime(2026, 1, 1), run_size=1) as writer:
+            writer.add(FOLLOWERS, [(1, "a"), (2, "b")])
+            raise RuntimeError("fetch failed")
+    assert os.listdir(tmp_path) == []
+
+
+def test_reader_to_data(tmp_path):
+    path = write(tmp_path / "me.ndjson.gz", [(2, "b"), (1, "a")], [(2, "b")])
+    data = SnapshotReader(path).to_data()
+    assert data["username"] == "me" and data["timestamp"] == "01_01_2026_10_00"
+    assert data["followers"] == {"a", "b"} and data["following"] == {"b"}
+    assert data["follower_ids"].pairs() == [(1, "a"), (2, "b")]
+    assert data["stats"] == {"followers_count": 2, "following_count": 1}
+
+
+def test_reader_rejects_other_files(tmp_path):
+    path = tmp_path / "other.ndjson.gz"
+    with gzip.open(path, "wt") as f:
+        f.write(json.dumps({"format": "something else"}) + "\n")
+    with pytest.raises(ValueError):
+        SnapshotReader(str(path))
+
+
+def test_diff_streams():
+    old = [(1, "a"), (2, "b"), (3, "c")]
+    new = [(2, "bb"), (3, "c"), (4, "d")]
+    assert diff_streams(iter(old), iter(new)) == (["d"], ["a"], [(2, "b", "bb")])
+    assert diff_streams(iter([]), iter(new)) == (["bb", "c", "d"], [], [])
+    assert diff_streams(iter(old), iter([])) == ([], ["a", "b", "c"], [])
+
+
+def test_compare_snapshot_files_matches_in_memory_comparison(tmp_path):
+    old = write(tmp_path / "old.ndjson.gz", [(1, "a"), (2, "b"), (3, "c")], [(1, "a"), (5, "e")])
+    new = write(tmp_path / "new.ndjson.gz", [(2, "bb"), (3, "c"), (4, "d")], [(1, "a"), (6, "f")],
+                datetime(2026, 1, 2, 10, 0))
+    streamed = compare_snapshot_files(old, new)
+    manager = InstagramDataManager(str(tmp_path / "data"))
+    loaded = manager.compare_snapshots(manager.load_data(old), manager.load_data(new))
+    assert streamed == loaded
+    assert streamed["new_followers"] == ["d"] and streamed["unfollowed"] == ["e"]
+    assert streamed["renamed"] == [{"pk": 2, "old_username": "b", "new_username": "bb"}]
+
+
+def test_read_non_followers(tmp_path):
+    path = write(tmp_path / "me.ndjson.gz", [(1, "a"), (3, "c")], [(1, "a"), (2, "b"), (4, "d")])
+    assert read_non_followers(path) == ["b", "d"]
+
+
+def test_history_from_json_without_pks_to_ndjson(tmp_path):
+    with open(tmp_path / "me_01_01_2026_10_00.json", "w", encoding="utf-8") as f:
+        json.dump({"username": "me", "timestamp": "01_01_2026_10_00",
+                   "followers": ["a", "b"], "following": ["b"]}, f)
+    write(tmp_path / "me_01_01_2026_11_00.ndjson.gz", [(2, "b"), (3, "c")], [(2, "b")],
+          datetime(2026, 1, 1, 11, 0))
+    write(tmp_path / "me_01_01_2026_12_00.ndjson.gz", [(2, "bb"), (3, "c")], [],
+          datetime(2026, 1, 1, 12, 0))
+
+    first, second = InstagramDataManager(str(tmp_path)).get_history("me")
+    assert first["compared_with"] == "01_01_2026_10_00" and first["timestamp"] == "01_01_2026_11_00"
+    assert first["new_followers"] == ["c"] and first["unfollowers"] == ["a"]
+    assert first["new_following"] == [] and first["unfollowed"] == []
+    assert second["renamed"] == [{"pk": 2, "old_username": "b", "new_username": "bb"}]
+    assert second["unfollowed"] == ["b"]
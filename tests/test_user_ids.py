@@ -0,0 +1,63 @@
+from array import array
+
+import pytest
+
+from instagram_tracker import user_ids
+from instagram_tracker.user_ids import UserIdSet
+
+
+@pytest.fixture(params=["python", "numpy"])
+def merge_backend(request, monkeypatch):
+    """Run each test with the pure Python merge and, if installed, with numpy"""
+    if request.param == "python":
+        monkeypatch.setattr(user_ids, "np", None)
+    elif user_ids.np is None:
+        pytest.skip("numpy is not installed")
+    return request.param
+
+
+def test_from_pairs_sorts_and_drops_duplicate_pks(make_users):
+    users = make_users((3, "c"), (1, "a"), (3, "c"), (2, "b"))
+    assert list(users.pks) == [1, 2, 3]
+    assert users.pairs() == [(1, "a"), (2, "b"), (3, "c")]
+    assert 2 in users and 4 not in users
+
+
+@pytest.mark.parametrize("left, right, common, only_left", [
+    ([], [], [], []),
+    ([1, 2, 3], [], [], [1, 2, 3]),
+    ([], [1, 2], [], []),
+    ([1, 3, 5, 7], [2, 3, 4, 7, 9], [3, 7], [1, 5]),
+    ([1, 2, 3], [1, 2, 3], [1, 2, 3], []),
+    ([10, 20], [1, 2, 30], [], [10, 20]),
+    ([-5, 0, 2 ** 62], [0, 2 ** 62], [0, 2 ** 62], [-5]),
+])
+def test_merge(merge_backend, left, right, common, only_left):
+    a, b = array('q', left), array('q', right)
+    assert list(user_ids._merge(a, b, keep_common=True)) == common
+    assert list(user_ids._merge(a, b, keep_common=False)) == only_left
+
+
+def test_set_operations(merge_backend, make_users):
+    old = make_users((1, "a"), (2, "b"), (3, "c"))
+    new = make_users((2, "b"), (3, "c"), (4, "d"))
+    assert (new - old).usernames() == {"d"}
+    assert (old - new).usernames() == {"a"}
+    assert (old & new).usernames() == {"b", "c"}
+
+
+def test_renamed(merge_backend, make_users):
+    old = make_users((1, "a"), (2, "b"), (3, "c"))
+    new = make_users((1, "a"), (2, "bb"), (4, "c"))
+    # pk 3 left and pk 4 took its name: that is not a rename
+    assert old.renamed(new) == [(2, "b", "bb")]
+    assert (old - new).usernames() == {"c"}
+    assert (new - old).usernames() == {"c"}
+
+
+def test_shared_names_table():
+    names = {}
+    followers = UserIdSet.from_pairs([(1, "a"), (2, "b")], names)
+    following = UserIdSet.from_pairs([(2, "b"), (3, "c")], names)
+    assert followers.names is following.names
+    assert (following - followers).usernames() == {"c"}
@@ -0,0 +1,81 @@
+from instagram_tracker.user_resolver import UserIdResolver
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_resolver(tmp_path, clock):
+    return UserIdResolver(str(tmp_path / "user_ids.sqlite3"), ttl=10000, verify_after=100, clock=clock)
+
+
+def test_fresh_pk_is_not_verified(tmp_path):
+    clock = Clock()
+    resolver = make_resolver(tmp_path, clock)
+    lookups, checks = [], []
+    assert resolver.resolve("a", lambda name: lookups.append(name) or 1, checks.append) == 1
+    clock.now += 50
+    assert resolver.resolve("a", lambda name: lookups.append(name) or 2, checks.append) == 1
+    assert lookups == ["a"] and checks == []
+
+
+def test_stale_pk_is_confirmed_once(tmp_path):
+    clock = Clock()
+    make_resolver(tmp_path, clock).remember("a", 1)
+    clock.now += 200
+    resolver = make_resolver(tmp_path, clock)
+    checks = []
+    verify = lambda pk: checks.append(pk) or "a"
+    assert resolver.resolve("a", lambda name: 2, verify) == 1
+    assert resolver.resolve("a", lambda name: 2, verify) == 1
+    assert checks == [1]
+
+
+def test_username_passed_to_another_account(tmp_path):
+    clock = Clock()
+    resolver = make_resolver(tmp_path, clock)
+    resolver.remember("a", 1)
+    clock.now += 200
+    # Account 1 is now called "b", and the name "a" belongs to account 2
+    assert resolver.resolve("a", lambda name: 2, lambda pk: "b") == 2
+    assert resolver.resolve("b", lambda name: 3) == 1
+    assert make_resolver(tmp_path, clock).resolve("a", lambda name: 3) == 2
+
+
+def test_deleted_account_is_looked_up_again(tmp_path):
+    clock = Clock()
+    resolver = make_resolver(tmp_path, clock)
+    resolver.remember("a", 1)
+    clock.now += 200
+    assert resolver.resolve("a", lambda name: 2, lambda pk: None) == 2
+
+
+def test_forget(tmp_path):
+    clock = Clock()
+    resolver = make_resolver(tmp_path, clock)
+    resolver.remember("a", 1)
+    resolver.forget("a")
+    assert make_resolver(tmp_path, clock).resolve("a", lambda name: 2) == 2
+
+
+def test_failed_check_keeps_cached_pk(tmp_path):
+    clock = Clock()
+    make_resolver(tmp_path, clock).remember("a", 1)
+    clock.now += 200
+    resolver = make_resolver(tmp_path, clock)
+    checks = []
+
+    def verify(pk):
+        checks.append(pk)
+        raise ConnectionError("offline")
+
+    assert resolver.resolve("a", lambda name: 2, verify) == 1
+    assert resolver.resolve("a", lambda name: 2, verify) == 1
+    assert checks == [1]
+    # The next run tries the check again
+    assert make_resolver(tmp_path, clock).resolve("a", lambda name: 2, lambda pk: checks.append(pk) or "a") == 1
+    assert checks == [1, 1]